@@ -0,0 +1,5 @@
+"""
+Shared helpers for the Python prediction service.
+The leading underscore keeps Vercel from deploying this package as functions;
+api/run-prediction.py and the scripts/ entry points import from it directly.
+"""
@@ -0,0 +1,131 @@
+"""
+Admission control for the prediction handler
+At most max_concurrent requests run at once, and at most max_queue more
+wait for a slot. A request that would exceed the queue is rejected
+immediately (Overloaded -> 503 with Retry-After) instead of slowing every
+other request down. A request can carry a deadline. If the deadline passes
+while the request waits, or before inference starts, the request is dropped
+without scoring (DeadlineExceeded -> 504). max_concurrent=0 disables the
+slot limit, but deadlines are still honoured.
+"""
+
+import threading
+import time
+
+from .metrics import Histogram
+
+
+class Overloaded(Exception):
+    """Queue is full; the client should retry after retry_after seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before it could be scored"""
+
+
+def request_deadline(timeout_ms, default_ms=None, now=None):
+    """
+    Absolute monotonic deadline from a relative budget in milliseconds.
+
+    Args:
+        timeout_ms: Header value (str/number) or None
+        default_ms: Budget used when the header is absent
+        now: Monotonic start time (defaults to now)
+
+    Returns:
+        time.monotonic() deadline, or None for no deadline
+    """
+    value = timeout_ms if timeout_ms not in (None, '') else default_ms
+    if value in (None, ''):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if value <= 0:
+        return None
+    return (time.monotonic() if now is None else now) + value / 1000
+
+
+def expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, deadline-aware wait queue"""
+
+    def __init__(self, max_concurrent=0, max_queue=16, retry_after=1):
+        self.max_concurrent = max(0, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.retry_after = retry_after
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_seconds = Histogram()
+
+    def _has_slot(self):
+        return not self.max_concurrent or self.in_flight < self.max_concurrent
+
+    def acquire(self, deadline=None):
+        """
+        Wait for a slot. Raises Overloaded when the queue is full and
+        DeadlineExceeded when the deadline passes first. Returns the seconds
+        spent waiting.
+        """
+        started = time.monotonic()
+        with self._condition:
+            if expired(deadline):
+                self.expired += 1
+                raise DeadlineExceeded("Request deadline passed before it was admitted")
+            if not self._has_slot() and self.queued >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded(
+                    f"Server is at capacity ({self.in_flight} running, {self.queued} queued)",
+                    self.retry_after
+                )
+            self.queued += 1
+            try:
+                while not self._has_slot():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.expired += 1
+                        raise DeadlineExceeded("Request deadline passed while queued")
+                    self._condition.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            waited = time.monotonic() - started
+            self.wait_seconds.observe(waited)
+        return waited
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def record_expired(self):
+        """Count a request dropped after admission because its deadline passed"""
+        with self._condition:
+            self.expired += 1
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'mean_wait_ms': round(self.wait_seconds.total / self.wait_seconds.count * 1000, 3)
+                if self.wait_seconds.count else 0.0,
+            }
@@ -0,0 +1,171 @@
+"""
+Buffered prediction audit log
+Each prediction's feature vector, class probabilities, model hash and latency
+are copied into a preallocated in-memory ring buffer. A background thread
+swaps the buffer out and writes it as a columnar .npz segment, so the request
+path only pays for one small array copy. If the writer falls behind, the
+oldest unflushed rows are overwritten and counted as dropped rather than
+blocking requests.
+
+Segments are append-only, named by creation time, and rotated by count.
+load_audit_log() concatenates them for offline analysis.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class _Buffer:
+    """Fixed-capacity column arrays for one batch of audit rows"""
+
+    def __init__(self, capacity, n_features, max_classes):
+        self.features = np.zeros((capacity, n_features), dtype=np.float32)
+        self.probabilities = np.full((capacity, max_classes), np.nan, dtype=np.float32)
+        self.predicted = np.zeros(capacity, dtype=np.int16)
+        self.model_hash = np.zeros(capacity, dtype='S64')
+        self.latency_ms = np.zeros(capacity, dtype=np.float32)
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.head = 0
+        self.size = 0
+
+    def rows(self):
+        """Indices of buffered rows, oldest first"""
+        capacity = len(self.timestamp)
+        start = (self.head - self.size) % capacity
+        return (start + np.arange(self.size)) % capacity
+
+
+class AuditLog:
+    """Append-only columnar audit log with asynchronous batched flushing"""
+
+    def __init__(self, directory, n_features, capacity=4096, max_classes=8,
+                 flush_interval=5.0, max_segments=500):
+        self.directory = directory
+        self.n_features = n_features
+        self.capacity = capacity
+        self.max_classes = max_classes
+        self.flush_interval = flush_interval
+        self.max_segments = max_segments
+        self.dropped = 0
+        self.written = 0
+        self._classes = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._active = _Buffer(capacity, n_features, max_classes)
+        self._spare = _Buffer(capacity, n_features, max_classes)
+        self._wake = threading.Event()
+        self._closed = False
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='prediction-audit-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, features, probabilities, classes, model_hash, latency_ms):
+        """Buffer one prediction; never blocks on disk I/O"""
+        probabilities = np.asarray(probabilities, dtype=np.float32)[:self.max_classes]
+        with self._lock:
+            buf = self._active
+            i = buf.head
+            buf.features[i] = features
+            buf.probabilities[i, :len(probabilities)] = probabilities
+            buf.probabilities[i, len(probabilities):] = np.nan
+            buf.predicted[i] = int(np.argmax(probabilities)) if len(probabilities) else -1
+            buf.model_hash[i] = (model_hash or '').encode()[:64]
+            buf.latency_ms[i] = latency_ms
+            buf.timestamp[i] = time.time()
+            buf.head = (i + 1) % self.capacity
+            if buf.size == self.capacity:
+                self.dropped += 1
+            else:
+                buf.size += 1
+            if model_hash and model_hash not in self._classes:
+                self._classes[model_hash] = [str(c) for c in classes]
+            half_full = buf.size >= self.capacity // 2
+        if half_full:
+            self._wake.set()
+
+    def flush(self):
+        """Write all buffered rows to a new segment (called from the writer thread or on exit)"""
+        with self._write_lock:
+            with self._lock:
+                buf, self._active, self._spare = self._active, self._spare, self._active
+                classes = dict(self._classes)
+            if buf.size == 0:
+                return None
+            try:
+                return self._write_segment(buf, classes)
+            finally:
+                buf.head = 0
+                buf.size = 0
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[Python] Audit log flush failed: {e}")
+
+    def _write_segment(self, buf, classes):
+        rows = buf.rows()
+        self._sequence += 1
+        name = f"audit-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{os.getpid()}-{self._sequence:06d}.npz"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                features=buf.features[rows],
+                probabilities=buf.probabilities[rows],
+                predicted=buf.predicted[rows],
+                model_hash=buf.model_hash[rows],
+                latency_ms=buf.latency_ms[rows],
+                timestamp=buf.timestamp[rows],
+                classes=np.asarray(json.dumps(classes)),
+            )
+        os.replace(tmp_path, path)
+        self.written += len(rows)
+        self._rotate()
+        return path
+
+    def _rotate(self):
+        segments = sorted(glob.glob(os.path.join(self.directory, 'audit-*.npz')))
+        for old in segments[:-self.max_segments] if self.max_segments > 0 else []:
+            os.remove(old)
+
+    def stats(self):
+        with self._lock:
+            buffered = self._active.size
+        return {'buffered': buffered, 'written': self.written, 'dropped': self.dropped}
+
+
+def load_audit_log(directory):
+    """
+    Load every audit segment in directory into one dict of column arrays.
+    'classes' maps model hash to its class labels.
+    """
+    columns = {}
+    classes = {}
+    for path in sorted(glob.glob(os.path.join(directory, 'audit-*.npz'))):
+        with np.load(path, allow_pickle=False) as data:
+            for key in ('features', 'probabilities', 'predicted', 'model_hash', 'latency_ms', 'timestamp'):
+                columns.setdefault(key, []).append(data[key])
+            classes.update(json.loads(str(data['classes'])))
+    result = {key: np.concatenate(parts) for key, parts in columns.items()}
+    result['classes'] = classes
+    return result
@@ -0,0 +1,177 @@
+"""
+Historical backtesting against FOMC decisions
+Decision history (public/fed_decision_rate_fomc_ym.json, one rate per meeting
+month) is indexed as sorted month ordinals, so lining feature snapshots up
+with the decision that followed is a single np.searchsorted call. The history
+only records months, so several meetings in one month (e.g. 2001-01) are
+collapsed into one decision at the month's last rate and reported in
+DecisionIndex.collapsed. The label of a decision is its rate change in the
+model's class format ("+0.25%").
+Snapshots are scored in one batched pass and summarized by period.
+"""
+
+import json
+import os
+import numpy as np
+
+from .inference import infer
+
+DEFAULT_DECISIONS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'public', 'fed_decision_rate_fomc_ym.json'
+)
+
+
+def month_ordinals(dates):
+    """'YYYY-MM' or 'YYYY-MM-DD' strings -> int64 months since 1970-01"""
+    return np.asarray(dates, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def decision_label(change):
+    """Rate change in percentage points -> class label, e.g. 0.25 -> '+0.25%'"""
+    change = round(float(change), 2) + 0.0  # + 0.0 turns -0.0 into 0.0
+    return f"{change:+.2f}%"
+
+
+class DecisionIndex:
+    """FOMC decisions sorted by month, with vectorized 'next decision' lookup"""
+
+    def __init__(self, dates, rates):
+        months = month_ordinals(dates)
+        order = np.argsort(months, kind='stable')
+        months = months[order]
+        # Keep the last entry of each month: one decision per month, net of every meeting in it
+        last = np.flatnonzero(np.append(months[1:] != months[:-1], True))
+        counts = np.diff(last, prepend=-1)
+        self.collapsed = {dates[order[i]]: int(n) for i, n in zip(last, counts) if n > 1}
+        self.dates = [dates[order[i]] for i in last]
+        self.months = months[last]
+        self.rates = np.asarray(rates, dtype=np.float64)[order][last]
+        # The first meeting has no prior rate, so it has no decision label
+        changes = np.diff(self.rates, prepend=np.nan)
+        self.labels = [None] + [decision_label(c) for c in changes[1:]]
+
+    @classmethod
+    def load(cls, path=DEFAULT_DECISIONS_PATH):
+        with open(path, 'r') as f:
+            records = json.load(f)
+        return cls([r['Date'] for r in records], [r['FedDecisionRate'] for r in records])
+
+    def next_decision(self, dates, strictly_after=False):
+        """
+        Index of the first decision at (or strictly after) each date; -1 when
+        no decision follows within the history.
+        """
+        positions = np.searchsorted(self.months, month_ordinals(dates),
+                                    side='right' if strictly_after else 'left')
+        return np.where(positions < len(self.months), positions, -1)
+
+
+def period_key(date, period):
+    year = int(str(date)[:4])
+    if period == 'year':
+        return str(year)
+    if period == 'decade':
+        return f"{year // 10 * 10}s"
+    return 'all'
+
+
+def summarize(classes, probabilities, actual, n_bins=10):
+    """
+    Accuracy, calibration and confusion matrix for one group of predictions.
+
+    Args:
+        classes: Model class labels (strings)
+        probabilities: (n, n_classes) predicted probabilities
+        actual: Actual decision labels (may include labels the model never predicts)
+        n_bins: Confidence bins for the reliability table
+
+    Returns:
+        JSON-ready dict
+    """
+    n = len(actual)
+    predicted_index = np.argmax(probabilities, axis=1)
+    confidence = probabilities.max(axis=1)
+    predicted = [classes[i] for i in predicted_index]
+    correct = np.array([p == a for p, a in zip(predicted, actual)], dtype=bool)
+
+    # Brier score over the model's classes (actuals outside them count as all-zero targets)
+    class_index = {label: i for i, label in enumerate(classes)}
+    target = np.zeros_like(probabilities)
+    for row, label in enumerate(actual):
+        if label in class_index:
+            target[row, class_index[label]] = 1.0
+    brier = float(((probabilities - target) ** 2).sum(axis=1).mean()) if n else None
+
+    bins = np.minimum((confidence * n_bins).astype(int), n_bins - 1)
+    reliability = []
+    ece = 0.0
+    for b in range(n_bins):
+        in_bin = bins == b
+        count = int(in_bin.sum())
+        if not count:
+            continue
+        mean_confidence = float(confidence[in_bin].mean())
+        accuracy = float(correct[in_bin].mean())
+        ece += count / n * abs(mean_confidence - accuracy)
+        reliability.append({'bin': [b / n_bins, (b + 1) / n_bins], 'count': count,
+                            'confidence': mean_confidence, 'accuracy': accuracy})
+
+    labels = list(classes) + sorted(set(actual) - set(classes))
+    label_index = {label: i for i, label in enumerate(labels)}
+    matrix = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    np.add.at(matrix, ([label_index[a] for a in actual], [label_index[p] for p in predicted]), 1)
+
+    return {
+        'n': n,
+        'accuracy': float(correct.mean()) if n else None,
+        'brier_score': brier,
+        'expected_calibration_error': ece if n else None,
+        'reliability': reliability,
+        'confusion_matrix': {'labels': labels, 'rows_actual_columns_predicted': matrix.tolist()},
+    }
+
+
+def run_backtest(model, dates, X, decisions, period='year', strictly_after=False):
+    """
+    Score feature snapshots in one batch and compare with the decisions that followed.
+
+    Args:
+        model: Fitted classifier
+        dates: Snapshot dates ('YYYY-MM' or 'YYYY-MM-DD'), one per row of X
+        X: (n, n_features) feature matrix
+        decisions: DecisionIndex
+        period: 'year', 'decade' or 'all'
+        strictly_after: Match the first decision after the snapshot month
+            instead of at or after it
+
+    Returns:
+        JSON-ready report with overall and per-period summaries
+    """
+    dates = [str(d) for d in dates]
+    positions = decisions.next_decision(dates, strictly_after)
+    matched = np.array([p >= 0 and decisions.labels[p] is not None for p in positions], dtype=bool)
+    rows = np.flatnonzero(matched)
+
+    scored = infer(model, np.asarray(X)[rows])
+    probabilities = np.asarray(scored['probabilities'], dtype=np.float64)
+    classes = [str(c) for c in model.classes_]
+    actual = [decisions.labels[positions[r]] for r in rows]
+    decision_dates = [decisions.dates[positions[r]] for r in rows]
+
+    groups = {}
+    for i, date in enumerate(decision_dates):
+        groups.setdefault(period_key(date, period), []).append(i)
+
+    return {
+        'snapshots': len(dates),
+        'matched': int(len(rows)),
+        'unmatched': int(len(dates) - len(rows)),
+        'collapsed_decisions': decisions.collapsed,
+        'classes': classes,
+        'overall': summarize(classes, probabilities, actual),
+        'periods': {
+            key: summarize(classes, probabilities[idx], [actual[i] for i in idx])
+            for key, idx in sorted(groups.items())
+        },
+    }
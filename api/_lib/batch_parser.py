@@ -0,0 +1,188 @@
+"""
+Incremental batch body parsing
+Reads a request body in fixed-size blocks and decodes rows (JSONL, or a JSON
+array of row objects) one at a time straight into a preallocated NumPy
+feature buffer. The raw body and the list of parsed rows never exist in
+memory at once. Byte and row limits are enforced while reading, so oversized
+uploads are rejected (413) before they are fully consumed.
+"""
+
+import codecs
+import json
+import re
+import numpy as np
+
+READ_SIZE = 64 * 1024
+JSONL_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines',
+                       'application/json-lines')
+
+# What can remain of a number or literal cut off at the end of a block
+_PARTIAL_TOKEN = re.compile(r'-?\d*(\.\d*)?([eE][+-]?\d*)?|t(r(ue?)?)?|f(a(l(se?)?)?)?|n(u(ll?)?)?')
+
+
+class PayloadTooLarge(Exception):
+    """Body exceeds the configured byte or row limit (HTTP 413)"""
+
+
+def batch_body_format(content_type, query):
+    """
+    'jsonl' for JSON Lines bodies, 'array' for a JSON array body on a ?batch
+    request, otherwise None (a regular JSON request object).
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if media_type in JSONL_CONTENT_TYPES:
+        return 'jsonl'
+    if 'batch' in query:
+        return 'array'
+    return None
+
+
+def _blocks(rfile, content_length, max_bytes, read_size=READ_SIZE):
+    """Yield decoded text blocks of the body, enforcing max_bytes before reading"""
+    if content_length > max_bytes:
+        raise PayloadTooLarge(f"Request body is {content_length} bytes; the limit is {max_bytes}")
+    # Incremental decoding keeps multi-byte characters split across blocks intact
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    remaining = content_length
+    while remaining > 0:
+        data = rfile.read(min(read_size, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_jsonl_rows(rfile, content_length, max_bytes):
+    """Yield one parsed object per non-empty line"""
+    buffer = ''
+    for block in _blocks(rfile, content_length, max_bytes):
+        buffer += block
+        lines = buffer.split('\n')
+        buffer = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+def _cut_off(error, buffer):
+    """True when a decode error can be explained by the value running past the end of buffer"""
+    if error.msg.startswith('Unterminated string'):
+        return True
+    return _PARTIAL_TOKEN.fullmatch(buffer, error.pos) is not None
+
+
+def iter_json_array_rows(rfile, content_length, max_bytes):
+    """Yield the elements of a top-level JSON array without decoding the whole body"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    state = 'start'  # start -> value -> separator -> value ... -> done
+    blocks = _blocks(rfile, content_length, max_bytes)
+    exhausted = False
+
+    def more():
+        nonlocal buffer, position, exhausted
+        block = next(blocks, None)
+        if block is None:
+            exhausted = True
+            return False
+        buffer = buffer[position:] + block
+        position = 0
+        return True
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position >= len(buffer):
+            if exhausted or not more():
+                break
+            continue
+
+        char = buffer[position]
+        if state == 'start':
+            if char != '[':
+                raise ValueError("Batch body must be a JSON array of rows")
+            position += 1
+            state = 'first'
+        elif state in ('first', 'value'):
+            if state == 'first' and char == ']':
+                position += 1
+                state = 'done'
+                continue
+            try:
+                row, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # Cut off at the block boundary: read more and retry. Anything
+                # else is malformed, so fail without buffering the rest of the body
+                if not _cut_off(e, buffer) or exhausted or not more():
+                    raise
+                continue
+            position = end
+            state = 'separator'
+            yield row
+        elif state == 'separator':
+            position += 1
+            if char == ',':
+                state = 'value'
+            elif char == ']':
+                state = 'done'
+            else:
+                raise ValueError(f"Expected ',' or ']' in batch body, found {char!r}")
+        else:
+            raise ValueError("Unexpected data after the end of the batch array")
+
+    if state != 'done':
+        raise ValueError("Batch body ended before the JSON array was closed")
+
+
+class FeatureBuffer:
+    """Growable (n_rows, n_features) array with a hard row limit"""
+
+    def __init__(self, n_features, dtype=np.float64, max_rows=100000, initial_rows=1024):
+        self.max_rows = max_rows
+        self.data = np.empty((min(initial_rows, max_rows) or 1, n_features), dtype=dtype)
+        self.size = 0
+
+    def append(self, values):
+        if self.size >= self.max_rows:
+            raise PayloadTooLarge(f"Batch has more than {self.max_rows} rows")
+        if self.size == len(self.data):
+            grown = np.empty((min(len(self.data) * 2, self.max_rows), self.data.shape[1]), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = values
+        self.size += 1
+
+    def array(self):
+        return self.data[:self.size]
+
+
+def read_batch_body(rfile, content_length, body_format, convert, n_features,
+                    dtype=np.float64, max_rows=100000, max_bytes=32 * 1024 * 1024):
+    """
+    Decode a batch body into a feature matrix.
+
+    Args:
+        rfile: Request body stream
+        content_length: Declared body size in bytes
+        body_format: 'jsonl' or 'array'
+        convert: Callable mapping one row object to a 1D feature vector
+        n_features: Feature vector length
+        dtype: Buffer dtype
+        max_rows: Row limit (PayloadTooLarge beyond it)
+        max_bytes: Body size limit (PayloadTooLarge beyond it)
+
+    Returns:
+        (n_rows, n_features) array
+    """
+    rows = iter_jsonl_rows if body_format == 'jsonl' else iter_json_array_rows
+    # Rows are roughly 1 KB of JSON each, so this rarely needs to grow
+    buffer = FeatureBuffer(n_features, dtype, max_rows, initial_rows=content_length // 1024 + 1)
+    for row in rows(rfile, content_length, max_bytes):
+        if not isinstance(row, dict):
+            raise ValueError("Each batch row must be a JSON object of features")
+        buffer.append(convert(row))
+    return buffer.array()
@@ -0,0 +1,94 @@
+"""
+Batch prediction responses
+Formats scored rows either as one JSON document (a list of per-row dicts, or
+a compact columnar form with parallel arrays) or as NDJSON that is written
+chunk by chunk while later rows are still being scored. Streaming uses HTTP/1.1
+chunked transfer encoding when the client speaks HTTP/1.1, so the response
+never has to exist as one string.
+
+Formats:
+    json             {"classes": [...], "predictions": [{"row", "prediction", "probabilities", "confidence"}, ...]}
+    columnar         {"classes": [...], "labels": [...], "confidence": [...], "probabilities": {class: [...]}}
+    ndjson           one row object per line
+    ndjson-columnar  one columnar block per scored chunk, with its row offset
+"""
+
+import numpy as np
+
+from .inference import infer
+from .serialization import dumps_bytes
+
+BATCH_FORMATS = ('json', 'columnar', 'ndjson', 'ndjson-columnar')
+STREAMING_FORMATS = ('ndjson', 'ndjson-columnar')
+
+
+def score_chunks(model, X, chunk_size):
+    """Yield (row offset, scored dict) per chunk of rows, scoring lazily"""
+    chunk_size = max(1, int(chunk_size))
+    for start in range(0, len(X), chunk_size):
+        yield start, infer(model, X[start:start + chunk_size])
+
+
+def row_objects(classes, scored, offset=0):
+    """Per-row result dicts, shaped like the single-prediction response"""
+    labels = [str(label) for label in scored['labels']]
+    probabilities = np.asarray(scored['probabilities']).tolist()
+    confidence = np.asarray(scored['confidence']).tolist()
+    return [
+        {
+            'row': offset + i,
+            'prediction': labels[i],
+            'probabilities': dict(zip(classes, probabilities[i])),
+            'confidence': confidence[i],
+        }
+        for i in range(len(labels))
+    ]
+
+
+def columnar_block(classes, scored, offset=0):
+    """
+    Parallel arrays for a block of rows: one list per class instead of one dict
+    per row. The arrays are handed to the encoder as-is (contiguous columns).
+    """
+    probabilities = np.asarray(scored['probabilities'])
+    return {
+        'offset': offset,
+        'rows': len(probabilities),
+        'labels': np.asarray(scored['labels']).astype(str),
+        'confidence': np.ascontiguousarray(scored['confidence']),
+        'probabilities': {label: np.ascontiguousarray(probabilities[:, k]) for k, label in enumerate(classes)},
+    }
+
+
+def ndjson_lines(classes, scored, offset, response_format):
+    """Encoded NDJSON for one scored chunk"""
+    if response_format == 'ndjson-columnar':
+        records = [columnar_block(classes, scored, offset)]
+    else:
+        records = row_objects(classes, scored, offset)
+    return b''.join(dumps_bytes(record) + b'\n' for record in records)
+
+
+class ChunkedWriter:
+    """Writes HTTP/1.1 chunked frames (or raw bytes for HTTP/1.0 close-delimited bodies)"""
+
+    def __init__(self, wfile, chunked=True):
+        self.wfile = wfile
+        self.chunked = chunked
+        self.bytes_written = 0
+
+    def write(self, data):
+        if not data:
+            return
+        if self.chunked:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        else:
+            self.wfile.write(data)
+        self.bytes_written += len(data)
+        flush = getattr(self.wfile, 'flush', None)
+        if flush is not None:
+            flush()
+
+    def close(self):
+        if self.chunked:
+            self.wfile.write(b"0\r\n\r\n")
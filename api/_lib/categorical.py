@@ -0,0 +1,149 @@
+"""
+Deterministic categorical encoding
+String-valued columns (currently only Topic) are encoded from a vocabulary
+stored with the model. The vocabulary comes from a categorical_vocabularies_
+attribute on the model or from a sidecar file <model>.categories.json:
+
+    {"Topic": ["employment", "growth", "inflation", "monetary_policy"]}
+    {"Topic": {"inflation": 0, "growth": 1}}          (explicit codes)
+
+Known values map to their code. Unknown values map to an explicit
+unknown bucket, -1 by default. Numeric values pass through unchanged. When a
+model ships no vocabulary, strings fall back to a CRC32 bucket in [0, 1).
+Unlike the salted built-in hash(), this bucket is the same in every process.
+"""
+
+import json
+import os
+import zlib
+import numpy as np
+
+CATEGORICAL_COLUMNS = ('Topic',)
+UNKNOWN_CODE = -1.0
+
+
+def categories_path_for(model_path):
+    """Vocabulary sidecar location for a model file"""
+    return os.path.splitext(model_path)[0] + '.categories.json'
+
+
+def stable_bucket(value, buckets=1000):
+    """Process-independent replacement for hash(str(value)) % buckets / buckets"""
+    return float(zlib.crc32(str(value).encode('utf-8')) % buckets) / buckets
+
+
+class CategoricalEncoder:
+    """O(1) value -> code lookup with an unknown bucket"""
+
+    def __init__(self, vocabulary, unknown_code=UNKNOWN_CODE):
+        if isinstance(vocabulary, dict):
+            self.codes = {str(k): float(v) for k, v in vocabulary.items()}
+        else:
+            self.codes = {str(v): float(i) for i, v in enumerate(vocabulary)}
+        self.unknown_code = float(unknown_code)
+
+    def encode(self, value):
+        """Encode one value; numbers pass through, unseen strings get the unknown code"""
+        if value is None:
+            return 0.0
+        if isinstance(value, (bool, np.bool_)):
+            return 1.0 if value else 0.0
+        if isinstance(value, (int, float, np.number)):
+            return float(value)
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return self._lookup(str(value))
+
+    def _lookup(self, text):
+        return self.codes.get(text, self.unknown_code)
+
+    def __eq__(self, other):
+        """Encoders are equal when they map every value to the same code"""
+        return (type(self) is type(other) and self.codes == other.codes
+                and self.unknown_code == other.unknown_code)
+
+    __hash__ = None
+
+    def encode_many(self, values):
+        """Encode a batch: each distinct value is looked up once"""
+        values = list(values)
+        if not values:
+            return np.zeros(0)
+        uniques, inverse = np.unique(np.asarray([str(v) for v in values]), return_inverse=True)
+        # Keep the original objects for the pass-through rules (numbers, None, bools)
+        first = {}
+        for i, key in enumerate(inverse):
+            first.setdefault(key, values[i])
+        table = np.array([self.encode(first[k]) for k in range(len(uniques))], dtype=np.float64)
+        return table[inverse]
+
+
+class FallbackEncoder(CategoricalEncoder):
+    """Used when a model has no stored vocabulary: deterministic hash buckets"""
+
+    def __init__(self):
+        super().__init__([])
+
+    def _lookup(self, text):
+        return stable_bucket(text)
+
+
+def build_vocabulary(values):
+    """Sorted distinct string values, for saving next to a trained model"""
+    return sorted({str(v) for v in values if v is not None})
+
+
+def save_vocabularies(vocabularies, path):
+    with open(path, 'w') as f:
+        json.dump(vocabularies, f)
+
+
+def encoders_from_vocabularies(vocabularies):
+    """{column: vocabulary} -> {column: CategoricalEncoder}"""
+    return {column: CategoricalEncoder(vocabulary) for column, vocabulary in (vocabularies or {}).items()}
+
+
+def load_encoders(model=None, model_path=None):
+    """
+    Encoders for a model: categorical_vocabularies_ on the model wins, then the
+    <model>.categories.json sidecar. Columns without a vocabulary use the
+    deterministic fallback.
+    """
+    vocabularies = getattr(model, 'categorical_vocabularies_', None)
+    if vocabularies is None and model_path and os.path.exists(categories_path_for(model_path)):
+        with open(categories_path_for(model_path), 'r') as f:
+            vocabularies = json.load(f)
+    encoders = encoders_from_vocabularies(vocabularies)
+    for column in CATEGORICAL_COLUMNS:
+        encoders.setdefault(column, FallbackEncoder())
+    return encoders
+
+
+def list_value(column, value):
+    """Reduce a list feature to a scalar the way the service does"""
+    if len(value) == 0:
+        return 0.0
+    if column == 'Topic_Probabilities':
+        return float(np.sum(value))
+    return float(value[0])
+
+
+def encode_frame(df, encoders=None):
+    """
+    Encode a pandas DataFrame in place with the same rules as the service:
+    categorical columns through their encoders, list values reduced by
+    list_value().
+    """
+    encoders = encoders if encoders is not None else load_encoders()
+    for column in df.columns:
+        if df[column].dtype.kind in 'biufc':  # already numeric
+            continue
+        if column in encoders:
+            df[column] = encoders[column].encode_many(df[column])
+        else:
+            df[column] = [
+                list_value(column, v) if isinstance(v, (list, tuple, np.ndarray)) else v
+                for v in df[column]
+            ]
+    return df
@@ -0,0 +1,121 @@
+"""
+Micro-batching for concurrent single-row predictions
+When several handler threads score rows against the same model at nearly the
+same time, the first to arrive becomes the batch leader. It waits up to
+window_seconds (or until max_batch rows are queued), stacks the rows, runs
+one vectorized infer() call and hands every caller its own row. No
+background thread is involved. A caller waits at most the window plus the
+one batched inference.
+"""
+
+import threading
+import numpy as np
+
+from .inference import infer
+
+
+class _Pending:
+    """One caller's row and, once scored, its result or error"""
+
+    __slots__ = ('row', 'done', 'result', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Batch:
+    __slots__ = ('items', 'full', 'closed')
+
+    def __init__(self):
+        self.items = []
+        self.full = threading.Event()
+        self.closed = False
+
+
+def _row_slice(scored, i):
+    """The scored dict restricted to row i (arrays keep their leading axis)"""
+    return {
+        key: (value[i:i + 1] if isinstance(value, np.ndarray) else value)
+        for key, value in scored.items()
+    }
+
+
+class RequestCoalescer:
+    """Coalesces single-row infer() calls per model key"""
+
+    def __init__(self, window_seconds=0.002, max_batch=64):
+        self.window_seconds = float(window_seconds)
+        self.max_batch = max(1, int(max_batch))
+        self._lock = threading.Lock()
+        self._open = {}  # key -> batch still accepting rows
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_seen = 0
+
+    def infer(self, key, model, input_array):
+        """
+        Score input_array (one row) together with concurrent calls for the same key.
+
+        Args:
+            key: Identifies the model; only calls with equal keys share a batch
+            model: Fitted estimator (the same object for every call with this key)
+            input_array: (1, n_features) array
+
+        Returns:
+            infer() result for this caller's row
+        """
+        pending = _Pending(np.asarray(input_array)[0])
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            batch.items.append(pending)
+            if len(batch.items) >= self.max_batch:
+                self._close(key, batch)
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        batch.full.wait(self.window_seconds)
+        with self._lock:
+            self._close(key, batch)
+            items = batch.items
+            self.batches += 1
+            self.rows += len(items)
+            self.max_batch_seen = max(self.max_batch_seen, len(items))
+        try:
+            scored = infer(model, np.stack([item.row for item in items]))
+            for i, item in enumerate(items):
+                item.result = _row_slice(scored, i)
+        except Exception as e:
+            for item in items:
+                item.error = e
+        for item in items:
+            item.done.set()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _close(self, key, batch):
+        """Stop a batch accepting rows (caller holds the lock)"""
+        if not batch.closed:
+            batch.closed = True
+            batch.full.set()
+            if self._open.get(key) is batch:
+                del self._open[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'rows': self.rows,
+                'max_batch': self.max_batch_seen,
+                'mean_batch': (self.rows / self.batches) if self.batches else 0.0,
+            }
@@ -0,0 +1,284 @@
+"""
+Compiled float32 forest inference
+Flattens a fitted sklearn forest into contiguous float32/int32 node arrays and
+scores batches with vectorized NumPy traversal. Thresholds can optionally be
+quantized per feature into small integer bins so batch inputs shrink to
+uint8/uint16 bin indices. Both paths are exact with respect to sklearn's own
+comparisons and are validated against the float64 model before use. Leaf
+class distributions can additionally be stored as uint8 fixed point (lossy).
+"""
+
+import numpy as np
+
+# Rows scored per traversal block; bounds the (rows, trees) index buffers
+DEFAULT_BLOCK_ROWS = 1024
+
+
+class CompiledForest:
+    """Flat array representation of a forest classifier"""
+
+    def __init__(self, classes, feature, threshold, left, right, value, roots,
+                 max_depth, n_features, bin_edges=None, value_scale=1.0):
+        self.classes_ = np.asarray(classes)
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        # Per-feature sorted float32 thresholds when quantized, else None
+        self.bin_edges = bin_edges
+        # Multiplier turning stored leaf values back into probabilities
+        self.value_scale = float(value_scale)
+
+    @property
+    def quantized(self):
+        return self.bin_edges is not None
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        """Memory held by the node arrays"""
+        total = sum(a.nbytes for a in (self.feature, self.threshold, self.left,
+                                       self.right, self.value, self.roots))
+        if self.bin_edges is not None:
+            total += sum(edges.nbytes for edges in self.bin_edges)
+        return total
+
+    @classmethod
+    def from_sklearn(cls, model, quantize=False):
+        """
+        Compile a fitted RandomForestClassifier/ExtraTreesClassifier.
+
+        Args:
+            model: Fitted single-output forest classifier
+            quantize: Store thresholds as per-feature integer bins
+
+        Returns:
+            CompiledForest
+        """
+        estimators = getattr(model, 'estimators_', None)
+        if not isinstance(estimators, list) or not estimators or getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError(f"Cannot compile {type(model).__name__}: expected a fitted forest classifier")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(tree.node_count)
+
+            # Leaves point at themselves with an always-true test, so every row
+            # can be walked exactly max_depth steps without masking
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append((np.where(is_leaf, node_ids, tree.children_left) + offset).astype(np.int32))
+            rights.append((np.where(is_leaf, node_ids, tree.children_right) + offset).astype(np.int32))
+
+            node_value = tree.value[:, 0, :]
+            totals = node_value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+            # Internal node values are never read; zeros keep the artifact compressible
+            values.append(np.where(is_leaf[:, None], node_value / totals, 0.0).astype(np.float32))
+
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        feature = np.concatenate(features)
+        threshold = _round_down_float32(np.concatenate(thresholds))
+        compiled = cls(
+            classes=model.classes_,
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max_depth,
+            n_features=model.n_features_in_,
+        )
+        return compiled.quantize() if quantize else compiled
+
+    def quantize(self):
+        """Return a copy whose thresholds are per-feature integer bin indices"""
+        if self.quantized:
+            return self
+
+        is_leaf = ~np.isfinite(self.threshold)
+        bin_edges = []
+        for f in range(self.n_features_in_):
+            used = (self.feature == f) & ~is_leaf
+            bin_edges.append(np.unique(self.threshold[used]))
+        widest = max((len(edges) for edges in bin_edges), default=0)
+        dtype = np.uint8 if widest < np.iinfo(np.uint8).max else np.uint16
+        if widest >= np.iinfo(np.uint16).max:
+            dtype = np.uint32
+
+        # x <= t_j  <=>  (number of thresholds below x) <= j, for sorted unique t
+        threshold = np.full(self.threshold.shape, np.iinfo(dtype).max, dtype=dtype)
+        for f, edges in enumerate(bin_edges):
+            used = (self.feature == f) & ~is_leaf
+            threshold[used] = np.searchsorted(edges, self.threshold[used]).astype(dtype)
+
+        return CompiledForest(self.classes_, self.feature, threshold, self.left, self.right,
+                              self.value, self.roots, self.max_depth, self.n_features_in_,
+                              bin_edges=bin_edges, value_scale=self.value_scale)
+
+    def quantize_values(self):
+        """Return a copy storing leaf probabilities as uint8 fixed point (max error 1/510)"""
+        if self.value.dtype == np.uint8:
+            return self
+        value = np.rint(self.value.astype(np.float64) * self.value_scale * 255).astype(np.uint8)
+        return CompiledForest(self.classes_, self.feature, self.threshold, self.left, self.right,
+                              value, self.roots, self.max_depth, self.n_features_in_,
+                              bin_edges=self.bin_edges, value_scale=1.0 / 255)
+
+    def transform(self, X):
+        """Convert raw feature rows into the input buffer this forest compares against"""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has shape {X.shape}, but the forest expects {self.n_features_in_} features")
+        if not np.isfinite(X).all():
+            raise ValueError("Compiled forest inputs must be finite")
+        if not self.quantized:
+            return np.ascontiguousarray(X)
+
+        bins = np.empty(X.shape, dtype=self.threshold.dtype)
+        for f, edges in enumerate(self.bin_edges):
+            bins[:, f] = np.searchsorted(edges, X[:, f], side='left')
+        return bins
+
+    def predict_proba(self, X, block_rows=DEFAULT_BLOCK_ROWS):
+        """Average leaf class distributions over all trees"""
+        X = self.transform(X)
+        probabilities = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], block_rows):
+            block = X[start:start + block_rows]
+            leaves = self._leaves(block)
+            probabilities[start:start + block_rows] = (
+                self.value[leaves].sum(axis=1, dtype=np.float64) * (self.value_scale / self.n_trees)
+            )
+        return probabilities
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def _leaves(self, X):
+        """Walk every (row, tree) pair down to its leaf node index"""
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def save(self, path):
+        """Write the compiled arrays to a compressed .npz artifact"""
+        arrays = {
+            'classes': np.asarray(self.classes_.tolist()),
+            'feature': self.feature.astype(np.int16 if self.n_features_in_ < 2 ** 15 else np.int32),
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'roots': self.roots,
+            'meta': np.asarray([self.max_depth, self.n_features_in_], dtype=np.int64),
+            'value_scale': np.asarray(self.value_scale),
+        }
+        if self.bin_edges is not None:
+            arrays['bin_sizes'] = np.asarray([len(edges) for edges in self.bin_edges], dtype=np.int64)
+            arrays['bin_edges'] = np.concatenate(self.bin_edges) if self.bin_edges else np.empty(0, np.float32)
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load an artifact written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            bin_edges = None
+            if 'bin_sizes' in data:
+                bin_edges = np.split(data['bin_edges'], np.cumsum(data['bin_sizes'])[:-1])
+            max_depth, n_features = data['meta'].tolist()
+            return cls(
+                classes=data['classes'],
+                feature=data['feature'].astype(np.int32),
+                threshold=data['threshold'],
+                left=data['left'],
+                right=data['right'],
+                value=data['value'],
+                roots=data['roots'],
+                max_depth=max_depth,
+                n_features=n_features,
+                bin_edges=bin_edges,
+                value_scale=float(data['value_scale']) if 'value_scale' in data else 1.0,
+            )
+
+
+def reference_rows(compiled, n_rows=512, seed=0):
+    """
+    Build a reference set that exercises split boundaries.
+    Each value is a threshold of its feature, or the next float32 above/below it,
+    which is where reduced-precision comparisons would disagree first.
+    """
+    rng = np.random.default_rng(seed)
+    is_leaf = ~np.isfinite(compiled.threshold) if not compiled.quantized else None
+    X = rng.normal(size=(n_rows, compiled.n_features_in_)).astype(np.float32)
+    for f in range(compiled.n_features_in_):
+        if compiled.quantized:
+            edges = compiled.bin_edges[f]
+        else:
+            edges = np.unique(compiled.threshold[(compiled.feature == f) & ~is_leaf])
+        if len(edges) == 0:
+            continue
+        picked = rng.choice(edges, size=n_rows).astype(np.float32)
+        nudge = rng.integers(-1, 2, size=n_rows)
+        picked = np.where(nudge < 0, np.nextafter(picked, np.float32(-np.inf)), picked)
+        picked = np.where(nudge > 0, np.nextafter(picked, np.float32(np.inf)), picked)
+        X[:, f] = picked
+    return X
+
+
+def validate_compiled(compiled, model, X_reference=None, min_agreement=1.0, atol=1e-5):
+    """
+    Check that a compiled forest agrees with the float64 sklearn model.
+
+    Args:
+        compiled: CompiledForest built from model
+        model: Original fitted forest
+        X_reference: Optional reference rows; boundary rows are generated if None
+        min_agreement: Minimum fraction of rows with the same argmax label
+        atol: Maximum allowed absolute probability difference
+
+    Returns:
+        Dict with 'ok', 'rows', 'label_agreement' and 'max_abs_diff'
+    """
+    if X_reference is None:
+        X_reference = reference_rows(compiled)
+    X_reference = np.asarray(X_reference, dtype=np.float32)
+    expected = model.predict_proba(X_reference.astype(np.float64))
+    actual = compiled.predict_proba(X_reference)
+
+    agreement = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    max_abs_diff = float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+    return {
+        'ok': agreement >= min_agreement and max_abs_diff <= atol,
+        'rows': int(len(X_reference)),
+        'label_agreement': agreement,
+        'max_abs_diff': max_abs_diff,
+    }
+
+
+def _round_down_float32(threshold):
+    """Cast float64 thresholds to the largest float32 not above them.
+    For float32 inputs x this keeps x <= t exactly equivalent to sklearn's test."""
+    rounded = threshold.astype(np.float32)
+    too_high = rounded.astype(np.float64) > threshold
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
@@ -0,0 +1,186 @@
+"""
+Streaming feature-drift monitoring
+Keeps constant-size running statistics per feature column: Welford mean and
+variance (merged batch-wise), a histogram sketch over the reference
+quantile bins (for quantile estimates and PSI) and counters for values
+outside the training range. Drift is scored against a reference profile
+built from training data and saved next to the model as <model>.profile.json.
+"""
+
+import json
+import os
+import threading
+import numpy as np
+
+# PSI above this is conventionally treated as a significant distribution shift
+PSI_ALERT = 0.2
+
+
+def profile_path_for(model_path):
+    """Reference profile location for a model file"""
+    return os.path.splitext(model_path)[0] + '.profile.json'
+
+
+def build_reference_profile(X, feature_names=None, n_bins=20):
+    """
+    Summarize training data for later drift comparison.
+
+    Args:
+        X: 2D array of training rows
+        feature_names: Optional column names (defaults to feature_<i>)
+        n_bins: Number of quantile bins per feature
+
+    Returns:
+        JSON-serializable profile dict
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n_features = X.shape[1]
+    names = list(feature_names) if feature_names is not None else [f"feature_{i}" for i in range(n_features)]
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges = np.quantile(X, quantiles, axis=0).T  # (n_features, n_bins - 1)
+    reference = _bin_fractions(_histogram(X, edges, n_bins), len(X))
+    return {
+        'feature_names': names,
+        'n_rows': int(len(X)),
+        'n_bins': n_bins,
+        'edges': edges.tolist(),
+        'bin_fractions': reference.tolist(),
+        'mean': X.mean(axis=0).tolist(),
+        'std': X.std(axis=0).tolist(),
+        'min': X.min(axis=0).tolist(),
+        'max': X.max(axis=0).tolist(),
+    }
+
+
+def save_profile(profile, path):
+    with open(path, 'w') as f:
+        json.dump(profile, f)
+
+
+def load_profile(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _histogram(X, edges, n_bins):
+    """Count rows per (feature, bin); memory stays O(rows) whatever the bin count"""
+    n_features = X.shape[1]
+    histogram = np.empty((n_features, n_bins), dtype=np.int64)
+    for f in range(n_features):
+        # Bin index = number of edges strictly below the value
+        bins = np.searchsorted(edges[f], X[:, f], side='left')
+        histogram[f] = np.bincount(bins, minlength=n_bins)[:n_bins]
+    return histogram
+
+
+def _bin_fractions(histogram, total):
+    return histogram / max(total, 1)
+
+
+class DriftMonitor:
+    """O(1)-memory-per-feature running statistics compared against a reference profile"""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.feature_names = profile['feature_names']
+        self.n_bins = int(profile['n_bins'])
+        self.edges = np.asarray(profile['edges'], dtype=np.float64)
+        self.reference_fractions = np.asarray(profile['bin_fractions'], dtype=np.float64)
+        self.reference_mean = np.asarray(profile['mean'], dtype=np.float64)
+        self.reference_std = np.asarray(profile['std'], dtype=np.float64)
+        self.reference_min = np.asarray(profile['min'], dtype=np.float64)
+        self.reference_max = np.asarray(profile['max'], dtype=np.float64)
+
+        n_features = len(self.feature_names)
+        self.count = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.histogram = np.zeros((n_features, self.n_bins), dtype=np.int64)
+        self.below = np.zeros(n_features, dtype=np.int64)
+        self.above = np.zeros(n_features, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def update(self, X):
+        """Fold a batch of rows (n_rows, n_features) into the running statistics"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Rows have {X.shape[1]} features, but the drift profile has {len(self.feature_names)}")
+        n = len(X)
+        if n == 0:
+            return
+        batch_mean = X.mean(axis=0)
+        batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+        histogram = _histogram(X, self.edges, self.n_bins)
+        below = (X < self.reference_min).sum(axis=0)
+        above = (X > self.reference_max).sum(axis=0)
+
+        with self._lock:
+            # Chan et al. parallel merge of (count, mean, M2)
+            total = self.count + n
+            delta = batch_mean - self.mean
+            self.mean += delta * (n / total)
+            self.m2 += batch_m2 + delta ** 2 * (self.count * n / total)
+            self.count = total
+            self.histogram += histogram
+            self.below += below
+            self.above += above
+
+    def quantiles(self, qs=(0.05, 0.5, 0.95)):
+        """Estimate quantiles per feature by interpolating the histogram sketch"""
+        with self._lock:
+            histogram = self.histogram.astype(np.float64)
+        # Outer bins are bounded by the reference min/max
+        bounds = np.concatenate([self.reference_min[:, None], self.edges, self.reference_max[:, None]], axis=1)
+        cdf = np.cumsum(histogram, axis=1) / np.maximum(histogram.sum(axis=1, keepdims=True), 1)
+        cdf = np.concatenate([np.zeros((len(cdf), 1)), cdf], axis=1)
+        return {
+            q: np.array([np.interp(q, cdf[f], bounds[f]) for f in range(len(bounds))])
+            for q in qs
+        }
+
+    def scores(self):
+        """Per-feature drift scores: PSI, standardized mean shift and out-of-range rate"""
+        with self._lock:
+            count = self.count
+            fractions = _bin_fractions(self.histogram, count)
+            mean = self.mean.copy()
+            variance = self.m2 / count if count else np.zeros_like(self.m2)
+            out_of_range = (self.below + self.above) / max(count, 1)
+
+        eps = 1e-4
+        expected = np.clip(self.reference_fractions, eps, None)
+        actual = np.clip(fractions, eps, None)
+        psi = ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+        scale = np.where(self.reference_std > 0, self.reference_std, 1.0)
+        return {
+            'count': count,
+            'psi': psi,
+            'mean_shift': (mean - self.reference_mean) / scale,
+            'out_of_range_rate': out_of_range,
+            'mean': mean,
+            'std': np.sqrt(variance),
+        }
+
+    def report(self, top=10):
+        """JSON-ready drift summary, most drifted features first"""
+        scores = self.scores()
+        order = np.argsort(-scores['psi'])
+        features = [
+            {
+                'feature': self.feature_names[i],
+                'psi': float(scores['psi'][i]),
+                'mean_shift': float(scores['mean_shift'][i]),
+                'out_of_range_rate': float(scores['out_of_range_rate'][i]),
+                'mean': float(scores['mean'][i]),
+                'std': float(scores['std'][i]),
+            }
+            for i in order[:top]
+        ]
+        return {
+            'rows_observed': scores['count'],
+            'max_psi': float(scores['psi'].max()) if len(scores['psi']) else 0.0,
+            'drifted_features': [self.feature_names[i] for i in order if scores['psi'][i] > PSI_ALERT],
+            'top_features': features,
+        }
@@ -0,0 +1,136 @@
+"""
+Inference helpers for the prediction service
+Labels and confidence are derived from one predict_proba call instead of
+calling predict and predict_proba separately (each walks every tree).
+Forests can optionally be scored with per-row early exit.
+"""
+
+import numpy as np
+
+
+def infer(model, input_array, top_k=None):
+    """
+    Score input rows with a single predict_proba pass.
+
+    Args:
+        model: Fitted sklearn-style estimator
+        input_array: 2D array-like of shape (n_samples, n_features)
+        top_k: Optional number of most likely classes to return per row
+
+    Returns:
+        Dict with 'labels' (n_samples,), 'probabilities' (n_samples, n_classes),
+        'confidence' (n_samples,) and, when requested, 'top_k' as a list of
+        [(label, probability), ...] per row. Models without predict_proba fall
+        back to predict and report probabilities/confidence as None.
+    """
+    if not hasattr(model, 'predict_proba'):
+        return {
+            'labels': np.asarray(model.predict(input_array)),
+            'probabilities': None,
+            'confidence': None,
+        }
+
+    probabilities = np.asarray(model.predict_proba(input_array))
+    return _from_probabilities(model.classes_, probabilities, top_k)
+
+
+def infer_early_exit(model, input_array, chunk_size=16, tolerance=None, top_k=None):
+    """
+    Score rows through a forest chunk by chunk, stopping early per row.
+
+    A row stops once its leading class is ahead of the runner-up by more than
+    the number of trees still to vote (each tree adds at most 1 to a class), so
+    the argmax always matches the full forest. With a tolerance, rows also stop
+    once the running probability margin reaches it; that is faster but only
+    approximate. Probabilities of stopped rows are averaged over the trees that
+    were evaluated.
+
+    Args:
+        model: Fitted forest classifier (RandomForest/ExtraTrees); other models
+            fall back to infer() with 'trees_evaluated' set to None
+        input_array: 2D array-like of shape (n_samples, n_features)
+        chunk_size: Number of trees evaluated between margin checks
+        tolerance: Optional probability margin at which to stop early
+        top_k: Optional number of most likely classes to return per row
+
+    Returns:
+        Same dict as infer() plus 'trees_evaluated' (n_samples,)
+    """
+    estimators = forest_estimators(model)
+    if estimators is None:
+        result = infer(model, input_array, top_k=top_k)
+        result['trees_evaluated'] = None
+        return result
+
+    # Trees compare float32 thresholds; converting once matches what the forest does
+    X = np.ascontiguousarray(input_array, dtype=np.float32)
+    n_features = getattr(model, 'n_features_in_', X.shape[1])
+    if X.ndim != 2 or X.shape[1] != n_features:
+        raise ValueError(f"X has shape {X.shape}, but the forest expects {n_features} features")
+    n_trees = len(estimators)
+    n_classes = len(model.classes_)
+    chunk_size = max(1, int(chunk_size))
+
+    totals = np.zeros((X.shape[0], n_classes), dtype=np.float64)
+    evaluated = np.zeros(X.shape[0], dtype=np.intp)
+    active = np.arange(X.shape[0])
+    start = 0
+    while active.size and start < n_trees:
+        stop = min(start + chunk_size, n_trees)
+        X_active = X[active]
+        chunk_totals = np.zeros((active.size, n_classes), dtype=np.float64)
+        for estimator in estimators[start:stop]:
+            chunk_totals += estimator.predict_proba(X_active, check_input=False)
+        totals[active] += chunk_totals
+        evaluated[active] = stop
+        start = stop
+
+        if n_classes < 2:
+            break
+        leading = np.partition(totals[active], n_classes - 2, axis=1)[:, -2:]
+        margin = leading[:, 1] - leading[:, 0]
+        done = margin > (n_trees - stop)
+        if tolerance is not None:
+            done |= (margin / stop) >= tolerance
+        active = active[~done]
+
+    probabilities = totals / evaluated[:, None]
+    result = _from_probabilities(model.classes_, probabilities, top_k)
+    result['trees_evaluated'] = evaluated
+    return result
+
+
+def forest_estimators(model):
+    """Return the fitted trees of an averaging forest classifier, or None"""
+    estimators = getattr(model, 'estimators_', None)
+    if not isinstance(estimators, list) or not estimators:
+        return None
+    if getattr(model, 'n_outputs_', 1) != 1 or not hasattr(model, 'classes_'):
+        return None
+    if not all(hasattr(e, 'tree_') and hasattr(e, 'predict_proba') for e in estimators):
+        return None
+    return estimators
+
+
+def _from_probabilities(classes, probabilities, top_k=None):
+    """Derive labels, confidence and optional top-k from a probability matrix"""
+    # Same rule as ClassifierMixin.predict for forests: argmax, first class wins ties
+    best = np.argmax(probabilities, axis=1)
+    result = {
+        'labels': classes.take(best),
+        'probabilities': probabilities,
+        'confidence': probabilities[np.arange(len(best)), best],
+    }
+    if top_k:
+        result['top_k'] = top_k_classes(classes, probabilities, top_k)
+    return result
+
+
+def top_k_classes(classes, probabilities, k):
+    """Return the k most likely (label, probability) pairs for each row"""
+    k = min(int(k), probabilities.shape[1])
+    order = np.argsort(-probabilities, axis=1, kind='stable')[:, :k]
+    return [
+        [(classes[j], float(row[j])) for j in idx]
+        for row, idx in zip(probabilities, order)
+    ]
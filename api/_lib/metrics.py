@@ -0,0 +1,155 @@
+"""
+Prometheus-style metrics for the prediction service
+A small dependency-free registry of counters and histograms rendered in the
+Prometheus text exposition format. Values are per process, i.e. per warm
+function instance.
+"""
+
+import threading
+
+# Seconds; covers sub-millisecond inference up to multi-second cold downloads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram"""
+
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def render(self, name, labels=''):
+        lines = []
+        cumulative = 0
+        prefix = labels + ',' if labels else ''
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{name}_sum{suffix} {self.total:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+
+class PredictionMetrics:
+    """Request, stage latency, download and model metrics for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests_by_status = {}
+        self.request_latency = Histogram()
+        self.stage_latency = {}
+        self.bytes_downloaded = 0
+        self.active_model_hash = None
+
+    def observe_request(self, status, stages, total):
+        """Record one finished request: status code, {stage: seconds}, total seconds"""
+        with self._lock:
+            self.requests_by_status[status] = self.requests_by_status.get(status, 0) + 1
+            self.request_latency.observe(total)
+            for stage, seconds in stages.items():
+                histogram = self.stage_latency.get(stage)
+                if histogram is None:
+                    histogram = self.stage_latency[stage] = Histogram()
+                histogram.observe(seconds)
+
+    def add_downloaded_bytes(self, count):
+        with self._lock:
+            self.bytes_downloaded += int(count)
+
+    def set_active_model(self, sha256):
+        with self._lock:
+            self.active_model_hash = sha256
+
+    def render(self, cache_stats=None, coalescer_stats=None, admission=None):
+        """Render all metrics in Prometheus text format"""
+        with self._lock:
+            lines = [
+                '# HELP prediction_requests_total Prediction requests by HTTP status.',
+                '# TYPE prediction_requests_total counter',
+            ]
+            for status in sorted(self.requests_by_status):
+                lines.append(f'prediction_requests_total{{status="{status}"}} {self.requests_by_status[status]}')
+
+            lines += [
+                '# HELP prediction_request_duration_seconds End-to-end prediction request latency.',
+                '# TYPE prediction_request_duration_seconds histogram',
+            ]
+            lines += self.request_latency.render('prediction_request_duration_seconds')
+
+            lines += [
+                '# HELP prediction_stage_duration_seconds Latency of each request stage.',
+                '# TYPE prediction_stage_duration_seconds histogram',
+            ]
+            for stage in sorted(self.stage_latency):
+                lines += self.stage_latency[stage].render(
+                    'prediction_stage_duration_seconds', f'stage="{stage}"')
+
+            lines += [
+                '# HELP model_download_bytes_total Bytes of model files downloaded from storage.',
+                '# TYPE model_download_bytes_total counter',
+                f'model_download_bytes_total {self.bytes_downloaded}',
+            ]
+
+            if cache_stats is not None:
+                for key, kind, help_text in (
+                    ('hits', 'counter', 'Model cache hits.'),
+                    ('misses', 'counter', 'Model cache misses.'),
+                    ('evictions', 'counter', 'Models evicted from the cache.'),
+                    ('entries', 'gauge', 'Models currently resident.'),
+                    ('memory_bytes', 'gauge', 'Estimated memory held by resident models.'),
+                ):
+                    name = f'model_cache_{key}' + ('_total' if kind == 'counter' else '')
+                    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                              f'{name} {cache_stats[key]}']
+
+            if coalescer_stats is not None:
+                for key, kind, help_text in (
+                    ('batches', 'counter', 'Coalesced inference calls.'),
+                    ('rows', 'counter', 'Rows scored through the coalescer.'),
+                    ('max_batch', 'gauge', 'Largest coalesced batch.'),
+                    ('mean_batch', 'gauge', 'Mean rows per coalesced batch.'),
+                ):
+                    name = f'prediction_coalesced_{key}' + ('_total' if kind == 'counter' else '')
+                    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                              f'{name} {coalescer_stats[key]}']
+
+            if admission is not None:
+                admission_stats = admission.stats()
+                for key, kind, help_text in (
+                    ('in_flight', 'gauge', 'Requests currently being scored.'),
+                    ('queued', 'gauge', 'Requests waiting for a slot.'),
+                    ('admitted', 'counter', 'Requests admitted.'),
+                    ('rejected', 'counter', 'Requests rejected with 503 because the queue was full.'),
+                    ('expired', 'counter', 'Requests dropped because their deadline passed.'),
+                ):
+                    name = f'prediction_admission_{key}' + ('_total' if kind == 'counter' else '')
+                    lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                              f'{name} {admission_stats[key]}']
+                lines += [
+                    '# HELP prediction_queue_wait_seconds Time admitted requests waited for a slot.',
+                    '# TYPE prediction_queue_wait_seconds histogram',
+                ]
+                lines += admission.wait_seconds.render('prediction_queue_wait_seconds')
+
+            if self.active_model_hash:
+                lines += [
+                    '# HELP prediction_active_model_info Hash of the most recently served model.',
+                    '# TYPE prediction_active_model_info gauge',
+                    f'prediction_active_model_info{{sha256="{self.active_model_hash}"}} 1',
+                ]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,114 @@
+"""
+In-process model cache
+Keeps recently used unpickled models resident while a function instance stays
+warm, so repeat requests skip the download and unpickle stages. Entries are
+evicted least-recently-used first and can expire after a TTL. An on_evict
+callback lets per-model state kept elsewhere (compiled copies, explainers)
+be released together with the model.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+ModelEntry = namedtuple('ModelEntry', ['model', 'sha256', 'nbytes', 'loaded_at'])
+
+
+def model_nbytes(model, fallback=0):
+    """Estimate the resident size of a model (forest node arrays, else fallback)"""
+    if hasattr(model, 'nbytes'):
+        return int(model.nbytes)
+    estimators = getattr(model, 'estimators_', None)
+    if isinstance(estimators, list) and estimators and hasattr(estimators[0], 'tree_'):
+        total = 0
+        for estimator in estimators:
+            tree = estimator.tree_
+            # 64-byte node records plus the per-node class value array
+            total += tree.node_count * 64 + tree.value.nbytes
+        return total
+    return int(fallback)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ModelCache:
+    """Thread-safe LRU cache of loaded models with hit/miss/eviction counters"""
+
+    def __init__(self, max_entries=4, ttl=None, on_evict=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.on_evict = on_evict  # called with each evicted ModelEntry, outside the lock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached ModelEntry for key, or None (counted as a miss)"""
+        expired = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry.loaded_at > self.ttl:
+                expired = self._entries.pop(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if expired is not None:
+            self._evicted([expired])
+        return entry
+
+    def peek(self, key):
+        """Return the live ModelEntry for key without touching LRU order or counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and self.ttl and time.time() - entry.loaded_at > self.ttl:
+            return None
+        return entry
+
+    def put(self, key, model, sha256, nbytes):
+        entry = ModelEntry(model, sha256, int(nbytes), time.time())
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+                self.evictions += 1
+        self._evicted(evicted)
+        return entry
+
+    def _evicted(self, entries):
+        if self.on_evict is None:
+            return
+        for entry in entries:
+            self.on_evict(entry)
+
+    def clear(self):
+        """Drop every entry (on_evict runs for each) without counting evictions"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        self._evicted(entries)
+
+    def resident_hashes(self):
+        """sha256 of every model currently held"""
+        with self._lock:
+            return {entry.sha256 for entry in self._entries.values()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'memory_bytes': sum(e.nbytes for e in self._entries.values()),
+            }
@@ -0,0 +1,175 @@
+"""
+Opt-in request profiling
+Profiles a sampled fraction of requests and writes flamegraph-compatible
+collapsed stacks ("frame;frame;frame count" per line) to a local directory.
+
+Enable with PREDICTION_PROFILE=1 (sampled at PREDICTION_PROFILE_RATE, default
+0.01). A single request can be profiled by sending "X-Profile: <token>" when
+PREDICTION_PROFILE_TOKEN is set; without a token the header is ignored, so
+anonymous callers cannot force profiling. PREDICTION_PROFILE_MODE
+selects 'sample' (a background thread samples the request thread's stack;
+default) or 'cprofile' (deterministic, also writes a .prof pstats file).
+"""
+
+import cProfile
+import contextlib
+import glob
+import hmac
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+
+def profile_settings():
+    """Read profiling configuration from the environment"""
+    return {
+        'enabled': os.environ.get('PREDICTION_PROFILE', '').lower() in ('1', 'true', 'yes'),
+        'rate': float(os.environ.get('PREDICTION_PROFILE_RATE', 0.01)),
+        'mode': os.environ.get('PREDICTION_PROFILE_MODE', 'sample'),
+        'interval': float(os.environ.get('PREDICTION_PROFILE_INTERVAL', 0.001)),
+        'header_token': os.environ.get('PREDICTION_PROFILE_TOKEN', ''),
+        'max_files': int(os.environ.get('PREDICTION_PROFILE_MAX_FILES', 200)),
+        'output_dir': os.environ.get('PREDICTION_PROFILE_DIR',
+                                     os.path.join(tempfile.gettempdir(), 'prediction-profiles')),
+    }
+
+
+def maybe_profile(label, header_value=None):
+    """
+    Return a context manager that profiles the enclosed block when this
+    request is selected, or a no-op context otherwise.
+    """
+    settings = profile_settings()
+    token = settings['header_token']
+    forced = bool(token) and hmac.compare_digest(str(header_value or '').encode(), token.encode())
+    sampled = settings['enabled'] and random.random() < settings['rate']
+    if not (forced or sampled):
+        return contextlib.nullcontext()
+    return RequestProfiler(label, settings['mode'], settings['interval'],
+                           settings['output_dir'], settings['max_files'])
+
+
+def frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval from a daemon thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='prediction-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                key = ';'.join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+
+def collapse_cprofile(profile):
+    """
+    Approximate collapsed stacks from cProfile data: each function's own time
+    (microseconds) is attributed to its call chain via its heaviest caller.
+    """
+    stats = pstats.Stats(profile).stats
+    heaviest_caller = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        if callers:
+            heaviest_caller[func] = max(callers.items(), key=lambda item: item[1][3])[0]
+
+    def name(func):
+        filename, line, function = func
+        return f"{function} ({os.path.basename(filename)}:{line})"
+
+    counts = {}
+    for func, (_, _, own_time, _, _) in stats.items():
+        chain, seen, current = [], set(), func
+        while current is not None and current not in seen:
+            seen.add(current)
+            chain.append(name(current))
+            current = heaviest_caller.get(current)
+        weight = int(own_time * 1e6)
+        if weight:
+            key = ';'.join(reversed(chain))
+            counts[key] = counts.get(key, 0) + weight
+    return counts
+
+
+class RequestProfiler:
+    """Context manager that profiles the current thread and writes collapsed stacks"""
+
+    def __init__(self, label, mode='sample', interval=0.001, output_dir=None, max_files=200):
+        self.label = label
+        self.mode = mode
+        self.interval = interval
+        self.output_dir = output_dir or os.path.join(tempfile.gettempdir(), 'prediction-profiles')
+        self.max_files = max_files
+        self.path = None
+        self._profile = None
+        self._sampler = None
+
+    def __enter__(self):
+        self._started = time.time()
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+                counts = collapse_cprofile(self._profile)
+            else:
+                self._sampler.stop()
+                counts = self._sampler.counts
+            self.path = self._write(counts)
+            # stderr: the script entry points reserve stdout for their JSON result
+            print(f"[Python] Profile written to {self.path}", file=sys.stderr)
+        except Exception as e:
+            print(f"[Python] Failed to write profile: {e}", file=sys.stderr)
+        return False
+
+    def _write(self, counts):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(self._started))
+        base = os.path.join(self.output_dir, f"{self.label}-{stamp}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        with open(base + '.collapsed', 'w') as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        if self._profile is not None:
+            self._profile.dump_stats(base + '.prof')
+        self._prune()
+        return base + '.collapsed'
+
+    def _prune(self):
+        """Keep only the newest max_files profiles"""
+        files = sorted(glob.glob(os.path.join(self.output_dir, '*.collapsed')), key=os.path.getmtime)
+        for old in files[:-self.max_files] if self.max_files > 0 else []:
+            for path in (old, old[:-len('.collapsed')] + '.prof'):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -0,0 +1,212 @@
+"""
+Vectorized Monte Carlo scenario engine
+Draws N x n_features scenario matrices column by column from per-feature
+distributions (one vectorized draw per column per chunk), scores them in
+batches and summarizes the distribution of class probabilities with
+confidence intervals. Memory is bounded by the chunk size for the feature
+matrix; only the (N, n_classes) probabilities are kept.
+
+Distribution specs (per feature):
+    {"type": "constant", "value": v}
+    {"type": "uniform", "low": a, "high": b}
+    {"type": "normal", "mean": m, "std": s, "low": a, "high": b}   (low/high optional clip)
+    {"type": "randint", "low": a, "high": b}                       (high exclusive)
+    {"type": "choice", "values": [...], "p": [...]}
+    {"type": "ratio", "numerator": f1, "denominator": f2, "offset": 1}
+    {"type": "scaled", "of": f, "low": a, "high": b}                (f * uniform(a, b))
+
+Derived specs (ratio/scaled) may reference any feature that is not itself derived.
+"""
+
+import json
+import statistics
+import numpy as np
+
+from .inference import infer
+
+# Mirrors the ranges of fetch_features_from_api in scripts/predict_api.py
+DEFAULT_DISTRIBUTIONS = {
+    'Unnamed: 0': {'type': 'constant', 'value': 0},
+    'Sentiment Score': {'type': 'uniform', 'low': -1, 'high': 1},
+    'FinBERT Score': {'type': 'uniform', 'low': -1, 'high': 1},
+    'Average Sentiment Score': {'type': 'uniform', 'low': -0.5, 'high': 0.5},
+    'Hawkish_Count': {'type': 'randint', 'low': 0, 'high': 10},
+    'Dovish_Count': {'type': 'randint', 'low': 0, 'high': 10},
+    'Hawkish_to_Dovish_Ratio': {'type': 'ratio', 'numerator': 'Hawkish_Count',
+                                'denominator': 'Dovish_Count', 'offset': 1},
+    'Hawkish_Weighted_Count': {'type': 'scaled', 'of': 'Hawkish_Count', 'low': 0.8, 'high': 1.2},
+    # String topics are model-specific categorical codes; held fixed by default
+    'Topic': {'type': 'constant', 'value': 0},
+    # Dirichlet topic probabilities always sum to 1, which is what the service feeds
+    'Topic_Probabilities': {'type': 'constant', 'value': 1.0},
+    'Text_Length': {'type': 'randint', 'low': 100, 'high': 1000},
+    'Word_Count': {'type': 'randint', 'low': 50, 'high': 200},
+    'High_Point': {'type': 'randint', 'low': 0, 'high': 5},
+    'tightening': {'type': 'randint', 'low': 0, 'high': 3},
+    'inflation': {'type': 'randint', 'low': 0, 'high': 5},
+    'rate hike': {'type': 'randint', 'low': 0, 'high': 2},
+    'restrictive': {'type': 'randint', 'low': 0, 'high': 2},
+    'interest rate increase': {'type': 'randint', 'low': 0, 'high': 2},
+    'monetary policy tightening': {'type': 'constant', 'value': 0},
+    'overheating': {'type': 'constant', 'value': 0},
+    'constraining': {'type': 'constant', 'value': 0},
+    'hawkish': {'type': 'randint', 'low': 0, 'high': 3},
+    'discipline': {'type': 'constant', 'value': 0},
+    'easing': {'type': 'randint', 'low': 0, 'high': 2},
+    'accommodative': {'type': 'randint', 'low': 0, 'high': 2},
+    'supportive': {'type': 'randint', 'low': 0, 'high': 2},
+    'stimulation': {'type': 'constant', 'value': 0},
+    'interest rate cut': {'type': 'constant', 'value': 0},
+    'monetary policy easing': {'type': 'constant', 'value': 0},
+    'softening': {'type': 'constant', 'value': 0},
+    'expansionary': {'type': 'constant', 'value': 0},
+    'stimulus': {'type': 'constant', 'value': 0},
+    'dovish': {'type': 'randint', 'low': 0, 'high': 2},
+    'Actual': {'type': 'uniform', 'low': 2.0, 'high': 4.0},
+    'Previous': {'type': 'uniform', 'low': 2.0, 'high': 4.0},
+    'CPI': {'type': 'uniform', 'low': 2.0, 'high': 5.0},
+    'UnemploymentRate': {'type': 'uniform', 'low': 3.0, 'high': 6.0},
+    'FedFundsRate': {'type': 'uniform', 'low': 4.0, 'high': 6.0},
+    '10Y_Treasury_Yield': {'type': 'uniform', 'low': 3.0, 'high': 5.0},
+    '2Y_Treasury_Yield': {'type': 'uniform', 'low': 4.0, 'high': 6.0},
+    'GDP': {'type': 'uniform', 'low': 1.0, 'high': 3.0},
+    'PCE': {'type': 'uniform', 'low': 2.0, 'high': 4.0},
+    'Consumer_Sentiment_Index': {'type': 'uniform', 'low': 50, 'high': 100},
+    'Housing_Starts': {'type': 'uniform', 'low': 1000, 'high': 2000},
+    'Mortgage_Rates': {'type': 'uniform', 'low': 5.0, 'high': 8.0},
+    '10Yr_Treasury_Rate': {'type': 'uniform', 'low': 3.0, 'high': 5.0},
+    '2Yr_Treasury_Rate': {'type': 'uniform', 'low': 4.0, 'high': 6.0},
+    'Core_CPI': {'type': 'uniform', 'low': 2.0, 'high': 4.0},
+    'PCEPI': {'type': 'uniform', 'low': 2.0, 'high': 4.0},
+    'PPI': {'type': 'uniform', 'low': 1.0, 'high': 3.0},
+    'Real_GDP': {'type': 'uniform', 'low': 1.0, 'high': 3.0},
+    'Inflation_Expectations': {'type': 'uniform', 'low': 2.0, 'high': 4.0},
+    'Non_Farm_Payrolls': {'type': 'uniform', 'low': 100, 'high': 300},
+    'Eurozone_CPI': {'type': 'uniform', 'low': 1.0, 'high': 3.0},
+    'China_CPI': {'type': 'uniform', 'low': 1.0, 'high': 3.0},
+    'WTI_Crude_Oil': {'type': 'uniform', 'low': 60, 'high': 100},
+    'Brent_Crude_Oil': {'type': 'uniform', 'low': 65, 'high': 105},
+    'Bank_Loan_Rate': {'type': 'uniform', 'low': 5.0, 'high': 8.0},
+    'Real_Export_Rate': {'type': 'uniform', 'low': 1.0, 'high': 2.0},
+    'Total_Vehicle_Sales': {'type': 'uniform', 'low': 10, 'high': 20},
+    'Corporate_Yield': {'type': 'uniform', 'low': 4.0, 'high': 7.0},
+    'Effective_Rate': {'type': 'uniform', 'low': 4.0, 'high': 6.0},
+    'Fed_Reserve': {'type': 'uniform', 'low': 4.0, 'high': 6.0},
+}
+
+DERIVED_TYPES = ('ratio', 'scaled')
+
+
+def load_distributions(path=None, overrides=None):
+    """Default distributions, updated from a JSON config file and/or a dict"""
+    distributions = dict(DEFAULT_DISTRIBUTIONS)
+    if path:
+        with open(path, 'r') as f:
+            distributions.update(json.load(f))
+    if overrides:
+        distributions.update(overrides)
+    return distributions
+
+
+class ScenarioGenerator:
+    """Seeded generator of (n, n_features) scenario matrices"""
+
+    def __init__(self, feature_columns, distributions=None, seed=0, dtype=np.float64):
+        self.feature_columns = list(feature_columns)
+        self.distributions = distributions if distributions is not None else load_distributions()
+        self.index = {name: i for i, name in enumerate(self.feature_columns)}
+        self.rng = np.random.default_rng(seed)
+        self.dtype = dtype
+        for name, spec in self.distributions.items():
+            if spec.get('type') in DERIVED_TYPES:
+                for ref in (spec.get('numerator'), spec.get('denominator'), spec.get('of')):
+                    if ref is not None and self.distributions.get(ref, {}).get('type') in DERIVED_TYPES:
+                        raise ValueError(f"{name}: derived features cannot reference derived feature {ref}")
+
+    def generate(self, n):
+        """Draw n scenarios; features without a distribution are 0"""
+        X = np.zeros((n, len(self.feature_columns)), dtype=self.dtype)
+        derived = []
+        for name, spec in self.distributions.items():
+            column = self.index.get(name)
+            if column is None:
+                continue
+            if spec.get('type') in DERIVED_TYPES:
+                derived.append((column, spec))
+            else:
+                X[:, column] = self._draw(spec, n)
+        for column, spec in derived:
+            if spec['type'] == 'ratio':
+                X[:, column] = X[:, self.index[spec['numerator']]] / (
+                    X[:, self.index[spec['denominator']]] + spec.get('offset', 0))
+            else:
+                X[:, column] = X[:, self.index[spec['of']]] * self.rng.uniform(spec['low'], spec['high'], n)
+        return X
+
+    def chunks(self, n, chunk_size):
+        """Yield scenario matrices of at most chunk_size rows until n are produced"""
+        remaining = n
+        while remaining > 0:
+            size = min(chunk_size, remaining)
+            yield self.generate(size)
+            remaining -= size
+
+    def _draw(self, spec, n):
+        kind = spec.get('type')
+        if kind == 'constant':
+            return np.full(n, spec['value'])
+        if kind == 'uniform':
+            return self.rng.uniform(spec['low'], spec['high'], n)
+        if kind == 'normal':
+            values = self.rng.normal(spec['mean'], spec['std'], n)
+            if 'low' in spec or 'high' in spec:
+                values = np.clip(values, spec.get('low', -np.inf), spec.get('high', np.inf))
+            return values
+        if kind == 'randint':
+            return self.rng.integers(spec['low'], max(spec['high'], spec['low'] + 1), n)
+        if kind == 'choice':
+            return self.rng.choice(np.asarray(spec['values'], dtype=np.float64), size=n, p=spec.get('p'))
+        raise ValueError(f"Unknown distribution type: {kind}")
+
+
+def simulate(model, generator, n_scenarios, chunk_size=20000, confidence=0.95):
+    """
+    Score n_scenarios generated rows in chunks and summarize class probabilities.
+
+    Returns:
+        Dict with per-class mean, std, CI of the mean, percentile band and the
+        share of scenarios where the class is the predicted decision
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence must be between 0 and 1, got {confidence}")
+    classes = [str(c) for c in model.classes_]
+    probabilities = np.empty((n_scenarios, len(classes)), dtype=np.float32)
+    offset = 0
+    for X in generator.chunks(n_scenarios, chunk_size):
+        scored = infer(model, X)
+        probabilities[offset:offset + len(X)] = scored['probabilities']
+        offset += len(X)
+
+    tail = (1 - confidence) / 2 * 100
+    lower, median, upper = np.percentile(probabilities, [tail, 50, 100 - tail], axis=0)
+    mean = probabilities.mean(axis=0, dtype=np.float64)
+    std = probabilities.std(axis=0, dtype=np.float64)
+    # Normal-approximation CI of the mean; z is 1.96 for the default 95%
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * std / np.sqrt(max(n_scenarios, 1))
+    decisions = np.bincount(np.argmax(probabilities, axis=1), minlength=len(classes)) / max(n_scenarios, 1)
+
+    return {
+        'n_scenarios': int(n_scenarios),
+        'confidence': confidence,
+        'classes': {
+            label: {
+                'mean': float(mean[i]),
+                'std': float(std[i]),
+                'mean_ci': [float(mean[i] - half_width[i]), float(mean[i] + half_width[i])],
+                'percentiles': {'lower': float(lower[i]), 'median': float(median[i]), 'upper': float(upper[i])},
+                'decision_share': float(decisions[i]),
+            }
+            for i, label in enumerate(classes)
+        },
+    }
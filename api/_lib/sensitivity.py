@@ -0,0 +1,159 @@
+"""
+What-if sensitivity sweeps
+Perturbs chosen features of a base feature vector over value grids, builds
+every perturbed row in one vectorized step and scores them in a single
+predict_proba batch.
+
+Grid spec per feature (values are absolute unless "relative" is set):
+    [v1, v2, ...]                                 explicit values
+    {"values": [...]}                             explicit values
+    {"deltas": [...]}                             offsets added to the base value
+    {"start": a, "stop": b, "num": n}             evenly spaced (np.linspace)
+    {"start": a, "stop": b, "num": n, "relative": true}
+
+Modes:
+    curves  each feature is swept on its own, others held at the base
+            (one partial-dependence curve per feature)
+    grid    cartesian product of all grids (joint what-if surface)
+"""
+
+import math
+import numpy as np
+
+from .inference import infer
+
+DEFAULT_MAX_ROWS = 100000
+
+
+def grid_size(spec):
+    """Number of values a grid spec produces, computed without building it"""
+    if isinstance(spec, (list, tuple)):
+        return len(spec)
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid grid spec: {spec!r}")
+    for key in ('values', 'deltas'):
+        if key in spec:
+            if not isinstance(spec[key], (list, tuple)):
+                raise ValueError(f"Grid {key} must be a list of numbers: {spec!r}")
+            return len(spec[key])
+    if 'start' in spec and 'stop' in spec:
+        try:
+            return int(spec.get('num', 11))
+        except (TypeError, ValueError):
+            raise ValueError(f"Grid num must be an integer: {spec!r}")
+    raise ValueError(f"Grid spec needs values, deltas or start/stop: {spec!r}")
+
+
+def resolve_grid(spec, base_value):
+    """Turn one grid spec into a 1D float array of absolute feature values"""
+    if isinstance(spec, (list, tuple)):
+        return np.asarray(spec, dtype=np.float64)
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid grid spec: {spec!r}")
+    if 'values' in spec:
+        values = np.asarray(spec['values'], dtype=np.float64)
+        relative = spec.get('relative', False)
+    elif 'deltas' in spec:
+        values = np.asarray(spec['deltas'], dtype=np.float64)
+        relative = True
+    elif 'start' in spec and 'stop' in spec:
+        values = np.linspace(float(spec['start']), float(spec['stop']), int(spec.get('num', 11)))
+        relative = spec.get('relative', False)
+    else:
+        raise ValueError(f"Grid spec needs values, deltas or start/stop: {spec!r}")
+    if values.ndim != 1 or len(values) == 0:
+        raise ValueError(f"Grid must be a non-empty list of numbers: {spec!r}")
+    return values + base_value if relative else values
+
+
+def build_rows(base_row, columns, grids, mode='curves'):
+    """
+    Build all perturbed rows at once.
+
+    Args:
+        base_row: 1D base feature vector
+        columns: Column index per swept feature
+        grids: Absolute value array per swept feature
+        mode: 'curves' or 'grid'
+
+    Returns:
+        (n_rows, n_features) array in the base row's dtype
+    """
+    if mode == 'grid':
+        mesh = np.meshgrid(*grids, indexing='ij')
+        rows = np.repeat(base_row[None, :], mesh[0].size, axis=0)
+        rows[:, columns] = np.stack([m.ravel() for m in mesh], axis=1)
+        return rows
+    if mode != 'curves':
+        raise ValueError(f"Unknown sensitivity mode: {mode}")
+    sizes = [len(g) for g in grids]
+    rows = np.repeat(base_row[None, :], sum(sizes), axis=0)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    for column, grid, start, stop in zip(columns, grids, offsets[:-1], offsets[1:]):
+        rows[start:stop, column] = grid
+    return rows
+
+
+def run_sensitivity(model, base_row, feature_columns, grid_specs, mode='curves', max_rows=DEFAULT_MAX_ROWS):
+    """
+    Sweep features around base_row and score every perturbed row in one batch.
+
+    Args:
+        model: Fitted classifier (sklearn forest or CompiledForest)
+        base_row: 1D base feature vector in feature_columns order
+        feature_columns: Model feature names
+        grid_specs: {feature name: grid spec}
+        mode: 'curves' (per-feature partial dependence) or 'grid' (cartesian product)
+        max_rows: Refuse sweeps larger than this
+
+    Returns:
+        JSON-ready dict of swept values and per-class probabilities
+    """
+    if not grid_specs:
+        raise ValueError("Sensitivity request needs at least one feature grid")
+    if not isinstance(grid_specs, dict):
+        raise ValueError("Sensitivity grids must be an object of {feature: grid spec}")
+    index = {name: i for i, name in enumerate(feature_columns)}
+    unknown = [name for name in grid_specs if name not in index]
+    if unknown:
+        raise ValueError(f"Unknown sensitivity features: {unknown}")
+
+    if mode not in ('curves', 'grid'):
+        raise ValueError(f"Unknown sensitivity mode: {mode}")
+
+    # Size the sweep from the specs before any grid array is allocated
+    names = list(grid_specs)
+    sizes = [grid_size(grid_specs[name]) for name in names]
+    if min(sizes) < 1:
+        raise ValueError("Every sensitivity grid needs at least one value")
+    n_rows = math.prod(sizes) if mode == 'grid' else sum(sizes)
+    if n_rows > max_rows:
+        raise ValueError(f"Sensitivity sweep has {n_rows} rows; the limit is {max_rows}")
+
+    columns = [index[name] for name in names]
+    grids = [resolve_grid(grid_specs[name], float(base_row[index[name]])) for name in names]
+
+    rows = build_rows(np.asarray(base_row), columns, grids, mode)
+    probabilities = np.asarray(infer(model, rows)['probabilities'])
+    classes = [str(c) for c in model.classes_]
+
+    result = {'mode': mode, 'rows_scored': n_rows, 'classes': classes}
+    if mode == 'grid':
+        surface = probabilities.reshape(sizes + [len(classes)])
+        result['features'] = names
+        result['values'] = [g.tolist() for g in grids]
+        result['shape'] = sizes
+        result['probabilities'] = {label: surface[..., k].tolist() for k, label in enumerate(classes)}
+        return result
+
+    curves = {}
+    start = 0
+    for name, grid in zip(names, grids):
+        block = probabilities[start:start + len(grid)]
+        start += len(grid)
+        curves[name] = {
+            'values': grid.tolist(),
+            'probabilities': {label: block[:, k].tolist() for k, label in enumerate(classes)},
+        }
+    result['curves'] = curves
+    return result
@@ -0,0 +1,76 @@
+"""
+NumPy-aware JSON encoding
+One encoder for every response and script output. NumPy arrays and scalars
+are written directly, without a .tolist() / .item() pass over the payload
+first. orjson is used when it is installed (it encodes contiguous numeric
+arrays natively). Otherwise the stdlib encoder runs with a default hook.
+Output is compact unless pretty=True.
+"""
+
+import json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is the fallback
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+
+def _default(obj):
+    """Values neither backend encodes natively: arrays it can't take, NumPy scalars, sets"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _native_keys(obj):
+    """Copy of obj with NumPy dict keys made native"""
+    if isinstance(obj, dict):
+        return {
+            (key.item() if isinstance(key, np.generic) else key): _native_keys(value)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, (list, tuple)):
+        return [_native_keys(value) for value in obj]
+    return obj
+
+
+def _stdlib_dumps(obj, pretty):
+    if pretty:
+        return json.dumps(obj, default=_default, indent=2)
+    return json.dumps(obj, default=_default, separators=(',', ':'))
+
+
+def dumps_bytes(obj, pretty=False):
+    """
+    Encode obj as UTF-8 JSON.
+
+    Args:
+        obj: Payload; may contain NumPy arrays and scalars
+        pretty: Indent with two spaces (for scripts); compact otherwise
+
+    Returns:
+        Encoded bytes
+    """
+    if orjson is not None:
+        options = _ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            return orjson.dumps(obj, default=_default, option=options)
+        except TypeError:
+            # NumPy dict keys (e.g. integer model classes) are rejected by both backends
+            return orjson.dumps(_native_keys(obj), default=_default, option=options)
+    try:
+        return _stdlib_dumps(obj, pretty).encode('utf-8')
+    except TypeError:
+        return _stdlib_dumps(_native_keys(obj), pretty).encode('utf-8')
+
+
+def dumps(obj, pretty=False):
+    """Same as dumps_bytes() but returns str"""
+    return dumps_bytes(obj, pretty).decode('utf-8')
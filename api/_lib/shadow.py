@@ -0,0 +1,205 @@
+"""
+Shadow scoring of challenger models
+The champion answers the request. The feature matrix it was scored on, and
+the raw feature rows when the request kept them, are handed to a small
+worker pool that loads each challenger and scores the same rows. A prepare
+callback builds each challenger's own matrix (categorical columns encoded
+with its vocabulary) or skips a challenger whose input can't be rebuilt. Every
+comparison is logged as one JSON line and aggregated per challenger for the
+?shadow diagnostics endpoint. No part of this runs on the response path.
+When more than max_pending jobs are waiting, new ones are dropped and
+counted instead of building a backlog.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .inference import infer
+from .serialization import dumps
+
+
+def challenger_key(spec):
+    """Stable name for a challenger spec ({'model_path', 'supabase_storage_path'})"""
+    return spec.get('supabase_storage_path') or spec.get('model_path') or ''
+
+
+def parse_challengers(requested, default=None):
+    """
+    Challenger specs from the request body, or from PREDICTION_CHALLENGERS.
+
+    Args:
+        requested: List (or comma-separated string) of storage paths or
+            {'model_path', 'supabase_storage_path'} dicts; an empty list turns
+            shadow scoring off for the request
+        default: Same forms, used when requested is None
+
+    Returns:
+        List of spec dicts
+    """
+    if requested is None:
+        requested = default or []
+    if isinstance(requested, str):
+        requested = [path.strip() for path in requested.split(',') if path.strip()]
+    specs = []
+    for item in requested:
+        if isinstance(item, str):
+            item = {'supabase_storage_path': item}
+        if isinstance(item, dict) and challenger_key(item):
+            specs.append({
+                'model_path': item.get('model_path'),
+                'supabase_storage_path': item.get('supabase_storage_path'),
+            })
+    return specs
+
+
+def compare(champion_classes, champion_scored, challenger_classes, challenger_scored):
+    """Label agreement and mean absolute probability gap over the classes both models know"""
+    champion_labels = np.asarray(champion_scored['labels']).astype(str)
+    challenger_labels = np.asarray(challenger_scored['labels']).astype(str)
+    result = {
+        'rows': len(champion_labels),
+        'agreement': float(np.mean(champion_labels == challenger_labels)) if len(champion_labels) else 0.0,
+        'mean_abs_diff': None,
+        'compared_rows': 0,  # rows whose probabilities were compared
+    }
+    if champion_scored['probabilities'] is None or challenger_scored['probabilities'] is None:
+        return result
+    challenger_index = {label: k for k, label in enumerate(challenger_classes)}
+    common = [(k, challenger_index[label]) for k, label in enumerate(champion_classes) if label in challenger_index]
+    if common:
+        left = np.asarray(champion_scored['probabilities'])[:, [k for k, _ in common]]
+        right = np.asarray(challenger_scored['probabilities'])[:, [k for _, k in common]]
+        result['mean_abs_diff'] = float(np.mean(np.abs(left - right)))
+        result['compared_rows'] = len(champion_labels)
+    return result
+
+
+class ShadowScorer:
+    """Bounded background pool that scores challengers against the champion's rows"""
+
+    def __init__(self, load_model, prepare=None, max_workers=1, max_pending=64, log=print):
+        self.load_model = load_model  # spec -> (model, sha256)
+        # (spec, model, sha256, X, rows, encoders) -> challenger matrix, or None to skip it
+        self.prepare = prepare
+        self.max_pending = max(1, int(max_pending))
+        self.log = log
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)),
+                                            thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.dropped = 0
+        self.failed = 0
+        self.skipped = 0
+        self.challengers = {}  # key -> running totals
+
+    def submit(self, X, champion_model, champion_hash, challengers, champion_scored=None,
+               rows=None, encoders=None):
+        """
+        Queue challenger scoring for X. champion_scored is reused when given;
+        otherwise the champion is rescored in the background as well. rows
+        (the raw feature dicts behind X) and encoders (the champion's) are
+        passed to the prepare callback.
+        Returns False when the job was dropped because the queue is full.
+        """
+        if not challengers:
+            return False
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                return False
+            self.pending += 1
+        self._executor.submit(self._run, X, champion_model, champion_hash, challengers, champion_scored,
+                              rows, encoders)
+        return True
+
+    def _run(self, X, champion_model, champion_hash, challengers, champion_scored, rows, encoders):
+        try:
+            if champion_scored is None:
+                champion_scored = infer(champion_model, X)
+            champion_classes = [str(c) for c in getattr(champion_model, 'classes_', [])]
+            for spec in challengers:
+                key = challenger_key(spec)
+                try:
+                    model, model_hash = self.load_model(spec)
+                    X_challenger = X if self.prepare is None else self.prepare(
+                        spec, model, model_hash, X, rows, encoders)
+                    if X_challenger is None:
+                        with self._lock:
+                            self.skipped += 1
+                        self.log(f"[Python] Shadow scoring skipped {key}: its input can't be rebuilt for this request")
+                        continue
+                    started = time.perf_counter()
+                    scored = infer(model, X_challenger)
+                    latency_ms = (time.perf_counter() - started) * 1000
+                    comparison = compare(champion_classes, champion_scored,
+                                         [str(c) for c in getattr(model, 'classes_', [])], scored)
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    self.log(f"[Python] Shadow scoring failed for {key}: {e}")
+                    continue
+                self._record(key, model_hash, comparison, latency_ms)
+                record = {
+                    'event': 'shadow_prediction',
+                    'champion_sha256': champion_hash,
+                    'challenger': key,
+                    'challenger_sha256': model_hash,
+                    'latency_ms': round(latency_ms, 3),
+                    **comparison,
+                }
+                if len(X) == 1:
+                    # Single predictions log the challenger's full output next to the champion's
+                    record['champion_prediction'] = str(champion_scored['labels'][0])
+                    record['prediction'] = str(scored['labels'][0])
+                    if scored['probabilities'] is not None:
+                        record['probabilities'] = dict(zip(map(str, model.classes_),
+                                                           np.asarray(scored['probabilities'])[0].tolist()))
+                self.log(dumps(record))
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def _record(self, key, model_hash, comparison, latency_ms):
+        with self._lock:
+            totals = self.challengers.setdefault(key, {
+                'sha256': model_hash, 'requests': 0, 'rows': 0, 'agreeing_rows': 0.0,
+                'compared_rows': 0, 'abs_diff_sum': 0.0, 'latency_ms_sum': 0.0,
+            })
+            totals['sha256'] = model_hash
+            totals['requests'] += 1
+            totals['rows'] += comparison['rows']
+            totals['agreeing_rows'] += comparison['agreement'] * comparison['rows']
+            if comparison['mean_abs_diff'] is not None:
+                totals['compared_rows'] += comparison['compared_rows']
+                totals['abs_diff_sum'] += comparison['mean_abs_diff'] * comparison['compared_rows']
+            totals['latency_ms_sum'] += latency_ms
+
+    def stats(self):
+        """Per-challenger agreement with the champion, plus queue counters"""
+        with self._lock:
+            challengers = {
+                key: {
+                    'sha256': t['sha256'],
+                    'requests': t['requests'],
+                    'rows': t['rows'],
+                    'agreement': t['agreeing_rows'] / t['rows'] if t['rows'] else None,
+                    'mean_abs_diff': t['abs_diff_sum'] / t['compared_rows'] if t['compared_rows'] else None,
+                    'mean_latency_ms': t['latency_ms_sum'] / t['requests'] if t['requests'] else None,
+                }
+                for key, t in self.challengers.items()
+            }
+            return {'pending': self.pending, 'dropped': self.dropped, 'failed': self.failed,
+                    'skipped': self.skipped, 'challengers': challengers}
+
+    def wait(self, timeout=None):
+        """Block until queued jobs finish (used by scripts and on shutdown)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if self.pending == 0:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
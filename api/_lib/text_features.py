@@ -0,0 +1,109 @@
+"""
+FOMC statement text features
+Turns raw statement text into the text-derived model columns (Text_Length,
+Word_Count, Hawkish_Count, Dovish_Count, Hawkish_to_Dovish_Ratio and the 20
+keyword counts) in one pass over the words.
+
+Keywords are matched as whole-word phrases, case-insensitively, with a
+word-level Aho-Corasick automaton built once at import. Overlapping phrases
+are all counted, so "monetary policy tightening" also counts "tightening".
+The automaton's transition table is fully expanded, so each word costs one
+dict lookup.
+"""
+
+import re
+from collections import deque
+
+HAWKISH_KEYWORDS = (
+    'tightening', 'inflation', 'rate hike', 'restrictive', 'interest rate increase',
+    'monetary policy tightening', 'overheating', 'constraining', 'hawkish', 'discipline',
+)
+DOVISH_KEYWORDS = (
+    'easing', 'accommodative', 'supportive', 'stimulation', 'interest rate cut',
+    'monetary policy easing', 'softening', 'expansionary', 'stimulus', 'dovish',
+)
+
+TEXT_FEATURE_COLUMNS = (
+    'Hawkish_Count', 'Dovish_Count', 'Hawkish_to_Dovish_Ratio', 'Text_Length', 'Word_Count',
+) + HAWKISH_KEYWORDS + DOVISH_KEYWORDS
+
+_WORD = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lowercase word tokens (punctuation between words is ignored)"""
+    return _WORD.findall(text.lower())
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over word tokens with a fully expanded transition table"""
+
+    def __init__(self, phrases):
+        self.phrases = tuple(phrases)
+        goto = [{}]
+        outputs = [[]]
+        for index, phrase in enumerate(self.phrases):
+            state = 0
+            for word in tokenize(phrase):
+                if word not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][word] = len(goto) - 1
+                state = goto[state][word]
+            outputs[state].append(index)
+
+        # Breadth-first failure links; transitions are completed with the failure state's
+        fail = [0] * len(goto)
+        self.delta = [dict(goto[0])]
+        self.delta.extend({} for _ in range(len(goto) - 1))
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self.delta[state] = dict(self.delta[fail[state]])
+            for word, child in goto[state].items():
+                self.delta[state][word] = child
+                fail[child] = self.delta[fail[state]].get(word, 0) if state else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+                queue.append(child)
+        self.outputs = [tuple(o) for o in outputs]
+
+    def count(self, tokens):
+        """Occurrences of each phrase (in phrase order) in a token sequence"""
+        counts = [0] * len(self.phrases)
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        for token in tokens:
+            state = delta[state].get(token, 0)
+            for index in outputs[state]:
+                counts[index] += 1
+        return counts
+
+
+_AUTOMATON = KeywordAutomaton(HAWKISH_KEYWORDS + DOVISH_KEYWORDS)
+
+
+def extract_text_features(text):
+    """
+    Compute the text-derived model columns for one statement.
+
+    Args:
+        text: Raw statement or minutes text
+
+    Returns:
+        Dict keyed by the model's column names
+    """
+    text = text or ''
+    counts = _AUTOMATON.count(tokenize(text))
+    n_hawkish = len(HAWKISH_KEYWORDS)
+    hawkish_count = sum(counts[:n_hawkish])
+    dovish_count = sum(counts[n_hawkish:])
+    features = {
+        'Hawkish_Count': hawkish_count,
+        'Dovish_Count': dovish_count,
+        'Hawkish_to_Dovish_Ratio': hawkish_count / (dovish_count + 1),
+        'Text_Length': len(text),
+        'Word_Count': len(text.split()),
+    }
+    features.update(zip(_AUTOMATON.phrases, counts))
+    return features
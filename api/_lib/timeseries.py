@@ -0,0 +1,136 @@
+"""
+Point-in-time time-series store
+Each series is a pair of sorted arrays: day ordinals (days since 1970-01-01)
+and float values. An "as of" lookup returns the latest observation on or
+before the query date, so joins never see data from after the date. Single
+lookups use bisect. Batch joins use one np.searchsorted per series.
+
+Month-only dates ("YYYY-MM") mean the first day of the month unless the
+series is loaded with period_end=True. With that option an observation only
+becomes visible on the last day of its month, which is the safe choice when
+the exact release day is unknown.
+"""
+
+import bisect
+import json
+import os
+import numpy as np
+
+
+def day_ordinals(dates, period_end=False):
+    """'YYYY-MM' / 'YYYY-MM-DD' strings (or datetime64) -> int64 days since 1970-01-01"""
+    dates = np.asarray(dates)
+    if period_end and dates.dtype.kind in ('U', 'S', 'O'):
+        # Only month-resolution strings move to the end of their month
+        month_only = np.array([len(str(d)) == 7 for d in dates.ravel()]).reshape(dates.shape)
+        days = dates.astype('datetime64[D]')
+        month_end = (days.astype('datetime64[M]') + 1).astype('datetime64[D]') - 1
+        return np.where(month_only, month_end, days).astype(np.int64)
+    return dates.astype('datetime64[D]').astype(np.int64)
+
+
+def day_ordinal(date):
+    return int(np.datetime64(str(date)[:10], 'D').astype(np.int64))
+
+
+class TimeSeriesStore:
+    """In-memory collection of sorted, array-backed series with as-of lookups"""
+
+    def __init__(self):
+        self.series = {}  # name -> (days int64 sorted, values float64)
+
+    def add_series(self, name, dates, values, period_end=False):
+        """Add or replace a series; dates need not be sorted (later duplicates win)"""
+        days = day_ordinals(dates, period_end)
+        values = np.asarray(values, dtype=np.float64)
+        if days.shape != values.shape:
+            raise ValueError(f"{name}: {len(days)} dates but {len(values)} values")
+        order = np.argsort(days, kind='stable')
+        days, values = days[order], values[order]
+        # Keep the last observation per day
+        keep = np.append(days[1:] != days[:-1], True) if len(days) else np.zeros(0, dtype=bool)
+        self.series[name] = (days[keep], values[keep])
+
+    def names(self):
+        return sorted(self.series)
+
+    def as_of(self, name, date, strict=False):
+        """
+        Latest value of a series on (or, with strict, before) date; None when
+        there is no earlier observation.
+        """
+        days, values = self.series[name]
+        target = day_ordinal(date)
+        i = (bisect.bisect_left(days, target) if strict else bisect.bisect_right(days, target)) - 1
+        return float(values[i]) if i >= 0 else None
+
+    def as_of_many(self, name, dates, strict=False):
+        """Vectorized as-of lookup; NaN where no observation precedes the date"""
+        days, values = self.series[name]
+        targets = day_ordinals(dates)
+        positions = np.searchsorted(days, targets, side='left' if strict else 'right') - 1
+        found = positions >= 0
+        result = np.full(targets.shape, np.nan)
+        result[found] = values[positions[found]]
+        return result
+
+    def row(self, date, names=None, strict=False):
+        """Point-in-time snapshot {series: value} for one date"""
+        return {name: self.as_of(name, date, strict) for name in (names or self.names())}
+
+    def join(self, dates, names=None, strict=False):
+        """(n_dates, n_series) matrix of as-of values for a batch of dates"""
+        names = names or self.names()
+        dates = np.asarray(dates)
+        if not names:
+            return np.zeros((len(dates), 0))
+        return np.stack([self.as_of_many(name, dates, strict) for name in names], axis=1)
+
+    def load_json(self, path, date_field='Date', value_fields=None, prefix='', period_end=False):
+        """
+        Load series from a JSON list of records, e.g.
+        public/fed_decision_rate_fomc_ym.json ([{"Date": "1998-10", "FedDecisionRate": 5.0}, ...]).
+        Every numeric field other than date_field becomes a series unless
+        value_fields is given.
+        """
+        with open(path, 'r') as f:
+            records = json.load(f)
+        if value_fields is None:
+            value_fields = sorted({
+                key for record in records for key, value in record.items()
+                if key != date_field and isinstance(value, (int, float)) and not isinstance(value, bool)
+            })
+        for field in value_fields:
+            rows = [r for r in records if isinstance(r.get(field), (int, float))]
+            self.add_series(prefix + field, [r[date_field] for r in rows], [r[field] for r in rows], period_end)
+        return self
+
+    def save(self, path):
+        """Write all series to a binary .npz cache"""
+        arrays = {}
+        for i, (name, (days, values)) in enumerate(sorted(self.series.items())):
+            arrays[f"days_{i}"] = days
+            arrays[f"values_{i}"] = values
+        arrays['names'] = np.asarray(json.dumps(sorted(self.series)))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a store written by save()"""
+        store = cls()
+        with np.load(path, allow_pickle=False) as data:
+            for i, name in enumerate(json.loads(str(data['names']))):
+                store.series[name] = (data[f"days_{i}"], data[f"values_{i}"])
+        return store
+
+    @classmethod
+    def from_json_cached(cls, json_path, cache_path, **load_options):
+        """Load from the binary cache, rebuilding it when the JSON source is newer"""
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(json_path):
+            return cls.load(cache_path)
+        store = cls().load_json(json_path, **load_options)
+        store.save(cache_path)
+        return store
@@ -0,0 +1,50 @@
+"""
+Per-request stage timing
+Lap-style timers on the monotonic perf_counter clock. Each lap is attributed
+to a named stage; the result is rendered as a Server-Timing header value and
+as one structured JSON log line per request.
+"""
+
+import json
+import time
+
+
+class StageTimer:
+    """Accumulates wall-clock time per stage for a single request"""
+
+    __slots__ = ('started', '_last', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.stages = {}
+
+    def lap(self, stage):
+        """Attribute the time since the previous lap (or start) to stage"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def skip(self):
+        """Drop the time since the previous lap without attributing it"""
+        self._last = time.perf_counter()
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def stages_ms(self):
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+
+    def server_timing(self):
+        """Render as a Server-Timing header value, e.g. 'load;dur=12.1, total;dur=15.0'"""
+        parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.2f}")
+        return ', '.join(parts)
+
+    def log_line(self, **fields):
+        """One structured JSON log line with stage durations and extra fields"""
+        record = {'event': 'prediction_timing'}
+        record.update(fields)
+        record['stages_ms'] = self.stages_ms()
+        record['total_ms'] = round(self.total() * 1000, 3)
+        return json.dumps(record, default=str)
@@ -13,9 +13,33 @@ import os
 import urllib.request
 import urllib.parse
 import tempfile
+import sys
+import threading
 import sklearn
 warnings.filterwarnings('ignore')
 
+# Shared helpers live in api/_lib (underscore keeps Vercel from deploying them as functions)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from _lib.inference import infer, infer_early_exit
+from _lib.compiled_forest import CompiledForest, validate_compiled
+from _lib.timing import StageTimer
+from _lib.model_cache import ModelCache, content_hash, model_nbytes
+from _lib.metrics import PredictionMetrics
+from _lib.profiling import maybe_profile
+from _lib.audit_log import AuditLog
+from _lib.drift import DriftMonitor, load_profile, profile_path_for
+from _lib.sensitivity import run_sensitivity
+from _lib.treeshap import TreeExplainer, explain_prediction
+from _lib.text_features import extract_text_features
+from _lib.categorical import categories_path_for, encoders_from_vocabularies, load_encoders
+from _lib.batch_response import (BATCH_FORMATS, STREAMING_FORMATS, ChunkedWriter, columnar_block,
+                                 ndjson_lines, row_objects, score_chunks)
+from _lib.batch_parser import PayloadTooLarge, batch_body_format, read_batch_body
+from _lib.serialization import dumps_bytes
+from _lib.coalescer import RequestCoalescer
+from _lib.admission import AdmissionController, DeadlineExceeded, Overloaded, expired, request_deadline
+from _lib.shadow import ShadowScorer, parse_challengers
+
 # Check scikit-learn version
 print(f"[Python] scikit-learn version: {sklearn.__version__}")
 if sklearn.__version__ != "1.2.2":
@@ -45,9 +69,15 @@ def get_original_features():
     return feature_columns
 
 
-def prepare_input_data(features_data, feature_columns):
+# Used when no model-specific vocabulary is available (deterministic across workers)
+_default_encoders = load_encoders()
+
+
+def prepare_input_data(features_data, feature_columns, dtype=np.float64, encoders=None):
     """Prepare input data from features dictionary - using numpy arrays instead of pandas"""
     try:
+        encoders = encoders or _default_encoders
+        
         # If the data is a list, use the first item
         if isinstance(features_data, list):
             features_data = features_data[0]
@@ -73,16 +103,14 @@ def prepare_input_data(features_data, feature_columns):
                 try:
                     value = float(value)
                 except (ValueError, TypeError):
-                    # For string columns like 'Topic', use hash or simple encoding
-                    if col == 'Topic':
-                        value = float(hash(str(value)) % 1000) / 1000.0
-                    else:
-                        value = 0.0
+                    # String categories like 'Topic' use the model's vocabulary (or a stable bucket)
+                    encoder = encoders.get(col)
+                    value = encoder.encode(value) if encoder is not None else 0.0
             
             feature_values.append(value)
         
         # Convert to numpy array and reshape for sklearn (1 sample, n features)
-        feature_array = np.array(feature_values, dtype=np.float64)
+        feature_array = np.array(feature_values, dtype=dtype)
         feature_array = feature_array.reshape(1, -1)
         
         # Replace any NaN or inf values with 0
@@ -93,142 +121,653 @@ def prepare_input_data(features_data, feature_columns):
         raise Exception(f"Error preparing input data: {e}")
 
 
-def make_prediction(model, input_array):
+def prepare_batch_data(rows, feature_columns, dtype=np.float64, encoders=None):
+    """Prepare a (n_rows, n_features) array from a list of feature dictionaries"""
+    batch = np.empty((len(rows), len(feature_columns)), dtype=dtype)
+    for i, row in enumerate(rows):
+        batch[i] = prepare_input_data(row, feature_columns, dtype=dtype, encoders=encoders)[0]
+    return batch
+
+
+def get_early_exit_options(requested):
+    """
+    Resolve early-exit settings from the request body or environment.
+    The request may send true or {"chunk_size": int, "tolerance": float};
+    PREDICTION_EARLY_EXIT=1 turns it on by default.
+    Returns None when early exit is off.
+    """
+    if requested is None:
+        requested = os.environ.get('PREDICTION_EARLY_EXIT', '').lower() in ('1', 'true', 'yes')
+    if not requested:
+        return None
+    
+    options = requested if isinstance(requested, dict) else {}
+    tolerance = options.get('tolerance', os.environ.get('PREDICTION_EARLY_EXIT_TOLERANCE'))
+    return {
+        'chunk_size': int(options.get('chunk_size', os.environ.get('PREDICTION_EARLY_EXIT_CHUNK', 16))),
+        'tolerance': float(tolerance) if tolerance not in (None, '') else None
+    }
+
+
+def release_model_state(entry):
+    """
+    Drop the per-model side caches (compiled forests, explainers, encoders,
+    drift monitors) when the model cache evicts a model, unless the same
+    model is still resident under another key.
+    """
+    model_hash = entry.sha256
+    if model_hash in model_cache.resident_hashes() | challenger_cache.resident_hashes():
+        return
+    for key in [key for key in list(_compiled_models) if key[0] == model_hash]:
+        _compiled_models.pop(key, None)
+    _explainers.pop(model_hash, None)
+    _encoders.pop(model_hash, None)
+    _drift_monitors.pop(model_hash, None)
+
+
+# Loaded models and request metrics, kept while the function instance stays warm
+model_cache = ModelCache(
+    max_entries=int(os.environ.get('PREDICTION_MODEL_CACHE_SIZE', 4)),
+    ttl=float(os.environ.get('PREDICTION_MODEL_CACHE_TTL', 600)) or None,
+    on_evict=release_model_state
+)
+metrics = PredictionMetrics()
+
+# Challenger models get their own small cache so shadow scoring never evicts the champion
+challenger_cache = ModelCache(
+    max_entries=int(os.environ.get('PREDICTION_SHADOW_CACHE_SIZE', 2)),
+    ttl=float(os.environ.get('PREDICTION_MODEL_CACHE_TTL', 600)) or None,
+    on_evict=release_model_state
+)
+
+# Bounded concurrency and wait queue; PREDICTION_MAX_CONCURRENT=0 leaves slots unlimited
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('PREDICTION_MAX_CONCURRENT', 0)),
+    max_queue=int(os.environ.get('PREDICTION_MAX_QUEUE', 16)),
+    retry_after=int(os.environ.get('PREDICTION_RETRY_AFTER', 1))
+)
+
+# Compiled reduced-precision forests, keyed by model hash and precision; this
+# and the other per-model caches below are released with model_cache evictions
+_compiled_models = {}
+
+# TreeSHAP path tables, keyed by model hash
+_explainers = {}
+
+# Prediction audit log, created on first use when PREDICTION_AUDIT_DIR is set
+_audit_log = None
+_audit_log_lock = threading.Lock()
+
+# Micro-batcher for concurrent single-row requests (PREDICTION_COALESCE_WINDOW_MS > 0)
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+# Background challenger scoring (request 'challengers' or PREDICTION_CHALLENGERS)
+_shadow_scorer = None
+_shadow_lock = threading.Lock()
+
+
+# Streaming drift monitors per model hash (None when no reference profile exists)
+_drift_monitors = {}
+
+
+def get_drift_monitor(model_hash, model_path=None, supabase_storage_path=None):
+    """
+    Return the drift monitor for a model when PREDICTION_DRIFT=1.
+    The reference profile is read from PREDICTION_DRIFT_PROFILE, from
+    <model>.profile.json next to a local model, or downloaded from the same
+    Supabase folder as the model.
+    """
+    if os.environ.get('PREDICTION_DRIFT', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    if model_hash in _drift_monitors:
+        return _drift_monitors[model_hash]
+    
+    monitor = None
+    try:
+        profile = None
+        explicit_path = os.environ.get('PREDICTION_DRIFT_PROFILE')
+        if explicit_path:
+            profile = load_profile(explicit_path)
+        elif model_path and os.path.exists(profile_path_for(model_path)):
+            profile = load_profile(profile_path_for(model_path))
+        elif supabase_storage_path:
+            profile = json.loads(download_model_from_supabase(profile_path_for(supabase_storage_path)))
+        if profile is not None:
+            monitor = DriftMonitor(profile)
+            if len(monitor.feature_names) != len(get_original_features()):
+                print(f"[Python] Drift profile has {len(monitor.feature_names)} features, "
+                      f"expected {len(get_original_features())}; drift monitoring disabled")
+                monitor = None
+    except Exception as e:
+        print(f"[Python] No drift reference profile available: {e}")
+    
+    _drift_monitors[model_hash] = monitor
+    return monitor
+
+
+def update_drift_monitor(model_hash, monitor, rows):
+    """Fold rows into a drift monitor; a failing monitor is logged and disabled, never failing the request"""
+    try:
+        monitor.update(rows)
+    except Exception as e:
+        print(f"[Python] Drift monitor failed and was disabled for this model: {e}")
+        _drift_monitors[model_hash] = None
+
+
+# Categorical encoders per model hash, built once from the model's stored vocabulary
+_encoders = {}
+
+
+def get_encoders(model_hash, model, model_path=None, supabase_storage_path=None):
+    """
+    Return the categorical encoders for a model. The vocabulary is read from
+    the model's categorical_vocabularies_ attribute, from <model>.categories.json
+    next to a local model, or from the same Supabase folder as the model.
+    """
+    if model_hash in _encoders:
+        return _encoders[model_hash]
+    
+    encoders = load_encoders(model, model_path)
+    has_vocabulary = getattr(model, 'categorical_vocabularies_', None) is not None or (
+        model_path and os.path.exists(categories_path_for(model_path)))
+    if not has_vocabulary and supabase_storage_path:
+        try:
+            vocabularies = json.loads(download_model_from_supabase(categories_path_for(supabase_storage_path)))
+            encoders.update(encoders_from_vocabularies(vocabularies))
+        except Exception as e:
+            print(f"[Python] No categorical vocabulary for model, using stable buckets: {e}")
+    
+    if model_hash:
+        _encoders[model_hash] = encoders
+    return encoders
+
+
+def get_audit_log():
+    """Return the process-wide audit log, or None when auditing is off"""
+    global _audit_log
+    directory = os.environ.get('PREDICTION_AUDIT_DIR')
+    if not directory:
+        return _audit_log
+    with _audit_log_lock:
+        if _audit_log is None:
+            _audit_log = AuditLog(
+                directory,
+                n_features=len(get_original_features()),
+                capacity=int(os.environ.get('PREDICTION_AUDIT_BUFFER', 4096)),
+                flush_interval=float(os.environ.get('PREDICTION_AUDIT_FLUSH_SECONDS', 5)),
+                max_segments=int(os.environ.get('PREDICTION_AUDIT_MAX_SEGMENTS', 500))
+            )
+        return _audit_log
+
+
+def get_coalescer():
+    """
+    Return the process-wide request coalescer, or None when coalescing is off.
+    Only useful when the handler runs under a threaded server, where concurrent
+    single-row requests for one model then share a predict_proba call.
+    """
+    global _coalescer
+    window_ms = float(os.environ.get('PREDICTION_COALESCE_WINDOW_MS', 0) or 0)
+    if window_ms <= 0:
+        return None
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = RequestCoalescer(
+                window_seconds=window_ms / 1000,
+                max_batch=int(os.environ.get('PREDICTION_COALESCE_MAX_BATCH', 64))
+            )
+    return _coalescer
+
+
+def load_challenger(spec):
+    """
+    Load a challenger model for shadow scoring: from the challenger cache, or
+    the model cache when it is already resident there (read only, so
+    challengers never displace champions), else from the local path or
+    Supabase. Returns (model, sha256).
+    """
+    model_path = spec.get('model_path')
+    supabase_storage_path = spec.get('supabase_storage_path')
+    cache_key = get_model_cache_key(model_path, supabase_storage_path)
+    cached = (challenger_cache.get(cache_key) or model_cache.peek(cache_key)) if cache_key else None
+    if cached is not None:
+        return cached.model, cached.sha256
+    if model_path and os.path.exists(model_path):
+        with open(model_path, 'rb') as f:
+            model_data = f.read()
+    elif supabase_storage_path:
+        model_data = download_model_from_supabase(supabase_storage_path)
+        metrics.add_downloaded_bytes(len(model_data))
+    else:
+        raise Exception('Challenger model not found locally and no Supabase storage path provided')
+    model = pickle.loads(model_data)
+    model_hash = content_hash(model_data)
+    if cache_key:
+        challenger_cache.put(cache_key, model, model_hash, model_nbytes(model, len(model_data)))
+    print(f"[Python] Loaded challenger model {model_hash[:12]} for shadow scoring")
+    return model, model_hash
+
+
+def prepare_challenger_input(spec, model, model_hash, X, rows, champion_encoders):
+    """
+    Feature matrix for a challenger. Raw rows are encoded with the challenger's
+    own categorical vocabulary. Without them (streamed batch bodies) the
+    champion's matrix is reused only when both vocabularies agree; otherwise
+    returns None and the challenger is skipped.
+    """
+    encoders = get_encoders(model_hash, model, spec.get('model_path'), spec.get('supabase_storage_path'))
+    if rows is not None:
+        return prepare_batch_data(rows, get_original_features(), encoders=encoders)
+    if encoders == champion_encoders:
+        return X
+    return None
+
+
+def get_shadow_scorer():
+    """Return the process-wide shadow scorer, created on first use"""
+    global _shadow_scorer
+    with _shadow_lock:
+        if _shadow_scorer is None:
+            _shadow_scorer = ShadowScorer(
+                load_challenger,
+                prepare_challenger_input,
+                max_workers=int(os.environ.get('PREDICTION_SHADOW_WORKERS', 1)),
+                max_pending=int(os.environ.get('PREDICTION_SHADOW_MAX_PENDING', 64))
+            )
+    return _shadow_scorer
+
+
+def get_model_cache_key(model_path, supabase_storage_path):
+    """Cache key for a model source; local keys change whenever the file does"""
+    if model_path and os.path.exists(model_path):
+        stat = os.stat(model_path)
+        return f"local:{model_path}:{stat.st_mtime_ns}:{stat.st_size}"
+    if supabase_storage_path:
+        return f"supabase:{supabase_storage_path}"
+    return None
+
+
+def get_compiled_model(model, cache_key, precision):
+    """
+    Compile a float32 (or threshold-quantized) copy of a forest model.
+    The copy is validated against the float64 model on boundary reference rows;
+    returns None when the model cannot be compiled or validation fails,
+    in which case the caller keeps using the original model.
+    """
+    key = (cache_key, precision)
+    if key in _compiled_models:
+        return _compiled_models[key]
+    
+    compiled = None
+    try:
+        candidate = CompiledForest.from_sklearn(model, quantize=(precision == 'quantized'))
+        report = validate_compiled(candidate, model)
+        if report['ok']:
+            compiled = candidate
+            print(f"[Python] Compiled {precision} forest: {candidate.nbytes} bytes, "
+                  f"agreement {report['label_agreement']:.4f} on {report['rows']} reference rows")
+        else:
+            print(f"[Python] Compiled {precision} forest failed validation: {report}")
+    except Exception as e:
+        print(f"[Python] Could not compile model for {precision} inference: {e}")
+    
+    if cache_key:
+        _compiled_models[key] = compiled
+    return compiled
+
+
+def get_explainer(model, cache_key):
+    """
+    Return the TreeSHAP explainer for a forest model, building its path tables
+    on first use. Returns None for models TreeSHAP does not support.
+    """
+    if cache_key in _explainers:
+        return _explainers[cache_key]
+    
+    explainer = None
+    try:
+        explainer = TreeExplainer(model)
+        print(f"[Python] Built TreeSHAP tables: {explainer.n_paths} paths, depth {explainer.depth}")
+    except Exception as e:
+        print(f"[Python] Could not build TreeSHAP explainer: {e}")
+    
+    if cache_key:
+        _explainers[cache_key] = explainer
+    return explainer
+
+
+def make_prediction(model, input_array, early_exit=None, coalesce_key=None):
     """Make prediction using the model - accepts numpy array"""
     try:
-        prediction = model.predict(input_array)[0]
-        probabilities = model.predict_proba(input_array)[0]
-        
-        # Convert numpy types to Python native types for JSON serialization
-        if hasattr(prediction, 'item'):
-            prediction = prediction.item()
-        prediction = str(prediction)
-        
-        return {
-            'prediction': prediction,
-            'probabilities': {str(k): float(v) for k, v in zip(model.classes_, probabilities.tolist())},
-            'confidence': float(np.max(probabilities))
+        # One predict_proba pass; label and confidence are derived from it
+        coalescer = get_coalescer() if coalesce_key is not None else None
+        if early_exit:
+            scored = infer_early_exit(model, input_array, **early_exit)
+        elif coalescer is not None:
+            scored = coalescer.infer(coalesce_key, model, input_array)
+        else:
+            scored = infer(model, input_array)
+        # NumPy scalars are left for the response encoder; keys are the class labels as text
+        result = {
+            'prediction': str(scored['labels'][0]),
+            'probabilities': dict(zip(map(str, model.classes_), scored['probabilities'][0])),
+            'confidence': scored['confidence'][0]
         }
+        if early_exit and scored.get('trees_evaluated') is not None:
+            result['trees_evaluated'] = int(scored['trees_evaluated'][0])
+            result['trees_total'] = len(model.estimators_)
+        return result
     except Exception as e:
         raise Exception(f"Error making prediction: {e}")
 
 
+def download_model_from_supabase(supabase_storage_path):
+    """Download model bytes from Supabase storage (signed URL first, then direct download)"""
+    # Get Supabase credentials from environment
+    supabase_url = os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
+    supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY') or os.environ.get('NEXT_PUBLIC_SUPABASE_ANON_KEY')
+    
+    if not supabase_url or not supabase_key:
+        raise Exception("Supabase credentials not found in environment")
+    
+    # Construct Supabase storage URL
+    # For private buckets, use: https://{project}.supabase.co/storage/v1/object/sign/{bucket}/{path}
+    # URL encode each path segment separately
+    path_parts = supabase_storage_path.split('/')
+    encoded_parts = [urllib.parse.quote(part, safe='') for part in path_parts]
+    encoded_path = '/'.join(encoded_parts)
+    
+    # Try signed URL endpoint first (for private buckets)
+    storage_url = f"{supabase_url}/storage/v1/object/sign/ml-models/{encoded_path}"
+    
+    print(f"[Python] Downloading model from Supabase")
+    print(f"[Python] Original path: {supabase_storage_path}")
+    print(f"[Python] Encoded path: {encoded_path}")
+    print(f"[Python] Using signed URL endpoint")
+    
+    # Download model file using signed URL
+    req = urllib.request.Request(storage_url)
+    req.add_header('apikey', supabase_key)
+    req.add_header('Authorization', f'Bearer {supabase_key}')
+    
+    try:
+        with urllib.request.urlopen(req) as response:
+            if response.status != 200:
+                raise Exception(f"HTTP {response.status}: {response.reason}")
+            # Signed URL returns a JSON with a signed URL, need to follow redirect or use direct download
+            signed_data = json.loads(response.read().decode('utf-8'))
+            if 'signedURL' in signed_data:
+                # Follow the signed URL
+                signed_url = signed_data['signedURL']
+                print(f"[Python] Following signed URL")
+                with urllib.request.urlopen(signed_url) as signed_response:
+                    model_data = signed_response.read()
+            else:
+                # Fallback: try direct download endpoint
+                direct_url = f"{supabase_url}/storage/v1/object/ml-models/{encoded_path}"
+                req_direct = urllib.request.Request(direct_url)
+                req_direct.add_header('apikey', supabase_key)
+                req_direct.add_header('Authorization', f'Bearer {supabase_key}')
+                with urllib.request.urlopen(req_direct) as direct_response:
+                    model_data = direct_response.read()
+    except urllib.error.HTTPError as e:
+        # If signed URL fails, try direct download endpoint
+        if e.code in [400, 404]:
+            print(f"[Python] Signed URL failed ({e.code}), trying direct download endpoint")
+            direct_url = f"{supabase_url}/storage/v1/object/ml-models/{encoded_path}"
+            print(f"[Python] Direct URL: {direct_url}")
+            req_direct = urllib.request.Request(direct_url)
+            req_direct.add_header('apikey', supabase_key)
+            req_direct.add_header('Authorization', f'Bearer {supabase_key}')
+            try:
+                print(f"[Python] Attempting direct download...")
+                with urllib.request.urlopen(req_direct) as response:
+                    if response.status != 200:
+                        raise Exception(f"HTTP {response.status}: {response.reason}")
+                    model_data = response.read()
+                    print(f"[Python] Downloaded {len(model_data)} bytes")
+            except urllib.error.HTTPError as e2:
+                error_body = e2.read().decode('utf-8') if e2.fp else str(e2)
+                print(f"[Python] Direct download failed: HTTP {e2.code}: {e2.reason}")
+                raise Exception(f"HTTP {e2.code}: {e2.reason}. Details: {error_body}")
+            except Exception as e2:
+                print(f"[Python] Direct download error: {str(e2)}")
+                raise
+        else:
+            error_body = e.read().decode('utf-8') if e.fp else str(e)
+            print(f"[Python] HTTP error: {e.code}: {e.reason}")
+            raise Exception(f"HTTP {e.code}: {e.reason}. Details: {error_body}")
+    except urllib.error.URLError as e:
+        print(f"[Python] URL error: {str(e)}")
+        raise Exception(f"URL Error: {str(e)}")
+    
+    return model_data
+
+
 class handler(BaseHTTPRequestHandler):
     """Vercel serverless function handler"""
     
+    def send_json(self, status, payload, headers=None):
+        """Serialize payload and send it with Server-Timing, then log one timing line"""
+        timer = getattr(self, 'timer', None)
+        if timer is not None:
+            timer.skip()
+        body = dumps_bytes(payload)
+        if timer is not None:
+            timer.lap('serialize')
+        
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if timer is not None:
+            self.send_header('Server-Timing', timer.server_timing())
+        self.end_headers()
+        self.wfile.write(body)
+        self.finish_request(status)
+    
+    def finish_request(self, status):
+        """Record request metrics and log one timing line"""
+        timer = getattr(self, 'timer', None)
+        if timer is not None:
+            metrics.observe_request(status, timer.stages, timer.total())
+            print(timer.log_line(status=status, **getattr(self, 'timing_fields', {})))
+    
+    def client_disconnected(self):
+        """End a request whose client went away mid-response, without writing to the socket again"""
+        self.close_connection = True
+        self.timing_fields = {**getattr(self, 'timing_fields', {}), 'client_disconnected': True}
+        # 499: client closed the request (nginx convention); only recorded, never sent
+        self.finish_request(499)
+    
+    def send_batch(self, model, input_batch, response_format, model_hash):
+        """Score a batch and send it as JSON, columnar JSON or streamed NDJSON"""
+        if response_format not in BATCH_FORMATS:
+            self.send_json(400, {
+                'error': f"Unknown response format '{response_format}', expected one of: {', '.join(BATCH_FORMATS)}"
+            })
+            return
+        classes = [str(c) for c in model.classes_]
+        audit_log = get_audit_log()
+        self.timing_fields['batch_rows'] = len(input_batch)
+        
+        if response_format not in STREAMING_FORMATS:
+            scored = infer(model, input_batch)
+            self.timer.lap('inference')
+            self.audit_batch(audit_log, input_batch, scored, classes, model_hash)
+            if response_format == 'columnar':
+                payload = {'classes': classes, **columnar_block(classes, scored)}
+            else:
+                payload = {'classes': classes, 'predictions': row_objects(classes, scored)}
+            self.send_json(200, payload)
+            return
+        
+        # Headers go out before the first chunk is scored; Server-Timing covers the stages so far
+        chunked = self.request_version == 'HTTP/1.1'
+        if chunked:
+            self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.send_header('Server-Timing', self.timer.server_timing())
+        self.end_headers()
+        self.close_connection = True
+        
+        writer = ChunkedWriter(self.wfile, chunked)
+        status = 200
+        chunk_size = int(os.environ.get('PREDICTION_STREAM_CHUNK', 256))
+        try:
+            for offset, scored in score_chunks(model, input_batch, chunk_size):
+                self.timer.lap('inference')
+                self.audit_batch(audit_log, input_batch[offset:], scored, classes, model_hash)
+                writer.write(ndjson_lines(classes, scored, offset, response_format))
+                self.timer.lap('serialize')
+                self.timing_fields.setdefault('first_chunk_ms', round(self.timer.total() * 1000, 3))
+        except (BrokenPipeError, ConnectionResetError):
+            self.client_disconnected()
+            return
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-band as a final line
+            status = 500
+            writer.write(dumps_bytes({'error': str(e)}) + b'\n')
+        writer.close()
+        self.finish_request(status)
+    
+    def audit_batch(self, audit_log, input_batch, scored, classes, model_hash):
+        """Buffer one audit row per scored row"""
+        if audit_log is None:
+            return
+        latency_ms = self.timer.total() * 1000
+        for row, probabilities in zip(input_batch, scored['probabilities']):
+            audit_log.record(row, probabilities, classes, model_hash, latency_ms)
+        self.timer.lap('audit')
+    
     def do_POST(self):
-        """Handle POST requests"""
+        """Handle POST requests (profiled when sampled or when X-Profile carries the profile token)"""
+        with maybe_profile('run-prediction', self.headers.get('X-Profile')):
+            self.timer = StageTimer()
+            self.timing_fields = {}
+            if not self.admit():
+                return
+            try:
+                self.handle_prediction()
+            finally:
+                admission.release()
+    
+    def admit(self):
+        """
+        Wait for a prediction slot. Sends 503 + Retry-After when the queue is full,
+        or 504 when the X-Request-Timeout-Ms budget runs out first; returns False then.
+        """
+        self.deadline = request_deadline(
+            self.headers.get('X-Request-Timeout-Ms'),
+            os.environ.get('PREDICTION_REQUEST_TIMEOUT_MS')
+        )
         try:
-            # Read request body
+            waited = admission.acquire(self.deadline)
+        except Overloaded as e:
+            self.close_connection = True
+            self.send_json(503, {'error': str(e)}, {'Retry-After': str(e.retry_after)})
+            return False
+        except DeadlineExceeded as e:
+            self.close_connection = True
+            self.send_json(504, {'error': str(e)})
+            return False
+        self.timer.lap('queue')
+        self.timing_fields['queue_wait_ms'] = round(waited * 1000, 3)
+        return True
+    
+    def handle_prediction(self):
+        """Load the model, prepare features and send the prediction"""
+        try:
+            # Reject oversized uploads before reading any of the body
             content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-            data = json.loads(body.decode('utf-8'))
+            max_bytes = int(os.environ.get('PREDICTION_MAX_BODY_BYTES', 32 * 1024 * 1024))
+            max_rows = int(os.environ.get('PREDICTION_BATCH_MAX_ROWS', 100000))
+            if content_length > max_bytes:
+                self.close_connection = True
+                self.send_json(413, {
+                    'error': f'Request body is {content_length} bytes; the limit is {max_bytes}'
+                })
+                return
+            
+            # JSONL / JSON array batch bodies are decoded row by row once the model
+            # is loaded; their parameters come from the query string
+            query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query, keep_blank_values=True)
+            body_format = batch_body_format(self.headers.get('Content-Type'), query)
+            if body_format:
+                data = {key: values[-1] for key, values in query.items()}
+                data['batch'] = True
+            else:
+                body = self.rfile.read(content_length)
+                data = json.loads(body.decode('utf-8'))
+            self.timer.lap('parse')
             
             # Extract parameters
             model_path = data.get('model_path')
             supabase_storage_path = data.get('supabase_storage_path')
             features = data.get('features')
             
-            if not features:
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({
+            # A raw statement fills in (and overrides) the text-derived columns of one row
+            text = data.get('text')
+            if text is not None:
+                base = features[0] if isinstance(features, list) and len(features) == 1 else (features or None)
+                if not isinstance(text, str):
+                    self.send_json(400, {'error': "Invalid text: expected a string"})
+                    return
+                if data.get('batch') or isinstance(base, list):
+                    self.send_json(400, {
+                        'error': "'text' scores a single statement and can't be combined with batch input"
+                    })
+                    return
+                if not isinstance(base, (dict, type(None))):
+                    self.send_json(400, {'error': "Invalid features: expected one object alongside 'text'"})
+                    return
+                if text:
+                    features = {**(base or {}), **extract_text_features(text)}
+            
+            if not features and not body_format:
+                self.send_json(400, {
                     'error': 'Missing required parameter: features'
-                }).encode())
+                })
                 return
             
-            # Try to load model from local path first
+            # Serve from the in-process model cache when this instance is warm
             model = None
-            if model_path:
+            model_hash = None
+            model_data = b''
+            cache_key = get_model_cache_key(model_path, supabase_storage_path)
+            cached = model_cache.get(cache_key) if cache_key else None
+            self.timer.lap('cache')
+            if cached is not None:
+                model, model_hash = cached.model, cached.sha256
+                self.timing_fields['model_source'] = 'cache'
+            
+            # Try to load model from local path first
+            if model is None and model_path:
                 try:
                     if os.path.exists(model_path):
                         with open(model_path, 'rb') as f:
-                            model = pickle.load(f)
+                            model_data = f.read()
+                        model = pickle.loads(model_data)
+                        model_hash = content_hash(model_data)
                         print(f"[Python] Loaded model from local path: {model_path}")
+                        self.timing_fields['model_source'] = 'local'
                 except Exception as e:
                     print(f"[Python] Failed to load from local path: {e}")
+                self.timer.lap('load')
             
             # If not found locally, download from Supabase
             if model is None and supabase_storage_path:
                 try:
-                    # Get Supabase credentials from environment
-                    supabase_url = os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
-                    supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY') or os.environ.get('NEXT_PUBLIC_SUPABASE_ANON_KEY')
-                    
-                    if not supabase_url or not supabase_key:
-                        raise Exception("Supabase credentials not found in environment")
-                    
-                    # Construct Supabase storage URL
-                    # For private buckets, use: https://{project}.supabase.co/storage/v1/object/sign/{bucket}/{path}
-                    # URL encode each path segment separately
-                    path_parts = supabase_storage_path.split('/')
-                    encoded_parts = [urllib.parse.quote(part, safe='') for part in path_parts]
-                    encoded_path = '/'.join(encoded_parts)
-                    
-                    # Try signed URL endpoint first (for private buckets)
-                    storage_url = f"{supabase_url}/storage/v1/object/sign/ml-models/{encoded_path}"
-                    
-                    print(f"[Python] Downloading model from Supabase")
-                    print(f"[Python] Original path: {supabase_storage_path}")
-                    print(f"[Python] Encoded path: {encoded_path}")
-                    print(f"[Python] Using signed URL endpoint")
-                    
-                    # Download model file using signed URL
-                    req = urllib.request.Request(storage_url)
-                    req.add_header('apikey', supabase_key)
-                    req.add_header('Authorization', f'Bearer {supabase_key}')
-                    
-                    try:
-                        with urllib.request.urlopen(req) as response:
-                            if response.status != 200:
-                                raise Exception(f"HTTP {response.status}: {response.reason}")
-                            # Signed URL returns a JSON with a signed URL, need to follow redirect or use direct download
-                            signed_data = json.loads(response.read().decode('utf-8'))
-                            if 'signedURL' in signed_data:
-                                # Follow the signed URL
-                                signed_url = signed_data['signedURL']
-                                print(f"[Python] Following signed URL")
-                                with urllib.request.urlopen(signed_url) as signed_response:
-                                    model_data = signed_response.read()
-                            else:
-                                # Fallback: try direct download endpoint
-                                direct_url = f"{supabase_url}/storage/v1/object/ml-models/{encoded_path}"
-                                req_direct = urllib.request.Request(direct_url)
-                                req_direct.add_header('apikey', supabase_key)
-                                req_direct.add_header('Authorization', f'Bearer {supabase_key}')
-                                with urllib.request.urlopen(req_direct) as direct_response:
-                                    model_data = direct_response.read()
-                    except urllib.error.HTTPError as e:
-                        # If signed URL fails, try direct download endpoint
-                        if e.code in [400, 404]:
-                            print(f"[Python] Signed URL failed ({e.code}), trying direct download endpoint")
-                            direct_url = f"{supabase_url}/storage/v1/object/ml-models/{encoded_path}"
-                            print(f"[Python] Direct URL: {direct_url}")
-                            req_direct = urllib.request.Request(direct_url)
-                            req_direct.add_header('apikey', supabase_key)
-                            req_direct.add_header('Authorization', f'Bearer {supabase_key}')
-                            try:
-                                print(f"[Python] Attempting direct download...")
-                                with urllib.request.urlopen(req_direct) as response:
-                                    if response.status != 200:
-                                        raise Exception(f"HTTP {response.status}: {response.reason}")
-                                    model_data = response.read()
-                                    print(f"[Python] Downloaded {len(model_data)} bytes")
-                            except urllib.error.HTTPError as e2:
-                                error_body = e2.read().decode('utf-8') if e2.fp else str(e2)
-                                print(f"[Python] Direct download failed: HTTP {e2.code}: {e2.reason}")
-                                raise Exception(f"HTTP {e2.code}: {e2.reason}. Details: {error_body}")
-                            except Exception as e2:
-                                print(f"[Python] Direct download error: {str(e2)}")
-                                raise
-                        else:
-                            error_body = e.read().decode('utf-8') if e.fp else str(e)
-                            print(f"[Python] HTTP error: {e.code}: {e.reason}")
-                            raise Exception(f"HTTP {e.code}: {e.reason}. Details: {error_body}")
-                    except urllib.error.URLError as e:
-                        print(f"[Python] URL error: {str(e)}")
-                        raise Exception(f"URL Error: {str(e)}")
+                    model_data = download_model_from_supabase(supabase_storage_path)
+                    self.timer.lap('fetch')
+                    self.timing_fields['model_bytes'] = len(model_data)
+                    metrics.add_downloaded_bytes(len(model_data))
+                    model_hash = content_hash(model_data)
                     
                     # Save to temp file and load
                     print(f"[Python] Saving model to temp file...")
@@ -257,57 +796,198 @@ class handler(BaseHTTPRequestHandler):
                         raise Exception(f"Failed to load model: {str(e)}")
                     
                     print(f"[Python] Model downloaded and cached to: {temp_model_path}")
+                    self.timer.lap('load')
+                    self.timing_fields['model_source'] = 'supabase'
                     
                 except Exception as e:
                     print(f"[Python] Exception during Supabase download: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    self.send_response(500)
-                    self.send_header('Content-Type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({
+                    self.timer.lap('fetch')
+                    self.send_json(500, {
                         'error': f'Failed to download model from Supabase: {str(e)}'
-                    }).encode())
+                    })
                     return
             
             if model is None:
-                self.send_response(404)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({
+                self.send_json(404, {
                     'error': 'Model file not found locally and no Supabase storage path provided'
-                }).encode())
+                })
                 return
             
+            if cached is None and cache_key:
+                model_cache.put(cache_key, model, model_hash, model_nbytes(model, len(model_data)))
+            metrics.set_active_model(model_hash)
+            self.timing_fields['model_sha256'] = model_hash
+            
+            # Explanations always use the original forest
+            source_model = model
+            
+            # Optionally swap in a compiled float32 / quantized copy of the forest
+            precision = data.get('precision') or os.environ.get('PREDICTION_PRECISION', 'float64')
+            if precision in ('float32', 'quantized'):
+                compiled = get_compiled_model(model, model_hash, precision)
+                if compiled is not None:
+                    model = compiled
+                self.timer.lap('compile')
+            
             # Get feature columns
             feature_columns = get_original_features()
             
             # Prepare input data as numpy array
-            input_array = prepare_input_data(features, feature_columns)
+            input_dtype = np.float32 if isinstance(model, CompiledForest) else np.float64
+            encoders = get_encoders(model_hash, source_model, model_path, supabase_storage_path)
+            
+            # Challenger models scored off the response path against the same features
+            challengers = parse_challengers(data.get('challengers'), os.environ.get('PREDICTION_CHALLENGERS'))
+            
+            # A cold model load can outlast the caller's budget; don't score for nobody
+            if expired(self.deadline):
+                admission.record_expired()
+                self.send_json(504, {'error': 'Request deadline passed before inference'})
+                return
+            
+            # Batch scoring: many rows in, JSON / columnar JSON / streamed NDJSON out
+            if data.get('batch'):
+                try:
+                    if body_format:
+                        input_batch = read_batch_body(
+                            self.rfile, content_length, body_format,
+                            lambda row: prepare_input_data(row, feature_columns, input_dtype, encoders)[0],
+                            len(feature_columns), input_dtype, max_rows, max_bytes
+                        )
+                    else:
+                        rows = features if isinstance(features, list) else [features]
+                        if len(rows) > max_rows:
+                            raise PayloadTooLarge(f"Batch has more than {max_rows} rows")
+                        input_batch = prepare_batch_data(rows, feature_columns, dtype=input_dtype, encoders=encoders)
+                    if not len(input_batch):
+                        raise ValueError("Batch has no rows")
+                except PayloadTooLarge as e:
+                    self.close_connection = True
+                    self.send_json(413, {'error': str(e)})
+                    return
+                except ValueError as e:
+                    self.close_connection = True
+                    self.send_json(400, {'error': f'Invalid batch body: {e}'})
+                    return
+                self.timer.lap('features')
+                drift_monitor = get_drift_monitor(model_hash, model_path, supabase_storage_path)
+                if drift_monitor is not None:
+                    update_drift_monitor(model_hash, drift_monitor, input_batch)
+                    self.timer.lap('drift')
+                self.send_batch(model, input_batch, data.get('response', 'json'), model_hash)
+                # Challengers rescore the same rows (and the champion) after the response
+                if challengers:
+                    get_shadow_scorer().submit(input_batch, model, model_hash, challengers,
+                                               rows=None if body_format else rows, encoders=encoders)
+                return
+            
+            input_array = prepare_input_data(features, feature_columns, dtype=input_dtype, encoders=encoders)
+            self.timer.lap('features')
+            
+            drift_monitor = get_drift_monitor(model_hash, model_path, supabase_storage_path)
+            if drift_monitor is not None:
+                update_drift_monitor(model_hash, drift_monitor, input_array)
+                self.timer.lap('drift')
+            
+            # Make prediction (optionally with early exit for large forests)
+            early_exit = get_early_exit_options(data.get('early_exit'))
+            if early_exit and model is not source_model:
+                # Early exit walks the sklearn trees, which the compiled copy doesn't have
+                result = make_prediction(source_model, input_array, early_exit)
+                result['precision'] = 'float64'
+            else:
+                result = make_prediction(model, input_array, early_exit, (model_hash, precision))
+            self.timer.lap('inference')
+            
+            # Buffered in memory; a background thread writes the columnar segments
+            audit_log = get_audit_log()
+            if audit_log is not None:
+                audit_log.record(input_array[0], list(result['probabilities'].values()),
+                                 list(result['probabilities'].keys()), model_hash,
+                                 self.timer.total() * 1000)
+                self.timer.lap('audit')
+            
+            # What-if sweep: every perturbed row scored in one batch
+            sensitivity = data.get('sensitivity')
+            if sensitivity:
+                if not isinstance(sensitivity, dict):
+                    self.send_json(400, {'error': 'Invalid sensitivity request: expected an object with grids'})
+                    return
+                try:
+                    result['sensitivity'] = run_sensitivity(
+                        model, input_array[0], feature_columns,
+                        sensitivity.get('grids'), sensitivity.get('mode', 'curves'),
+                        int(os.environ.get('PREDICTION_SENSITIVITY_MAX_ROWS', 100000))
+                    )
+                except ValueError as e:
+                    self.send_json(400, {'error': f'Invalid sensitivity request: {e}'})
+                    return
+                self.timer.lap('sensitivity')
             
-            # Make prediction
-            result = make_prediction(model, input_array)
+            # Exact TreeSHAP attributions; path tables are cached per model hash
+            explain = data.get('explain')
+            if explain:
+                explainer = get_explainer(source_model, model_hash)
+                if explainer is None:
+                    self.send_json(400, {'error': 'Explanations are only available for tree ensemble models'})
+                    return
+                top = explain.get('top', 10) if isinstance(explain, dict) else 10
+                result['explanation'] = explain_prediction(explainer, input_array, feature_columns, int(top))
+                self.timer.lap('explain')
             
             # Send response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.send_json(200, result)
+            
+            # Shadow scoring reuses the vectorized row and the champion's output
+            if challengers:
+                get_shadow_scorer().submit(input_array, model, model_hash, challengers, {
+                    'labels': [result['prediction']],
+                    'probabilities': np.array([list(result['probabilities'].values())])
+                }, rows=[features], encoders=encoders)
             
+        except (BrokenPipeError, ConnectionResetError):
+            self.client_disconnected()
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            self.send_json(500, {
                 'error': str(e)
-            }).encode())
+            })
     
     def do_GET(self):
-        """Handle GET requests - health check"""
+        """Handle GET requests - health check, Prometheus metrics on /metrics, drift report on /drift"""
+        url = urllib.parse.urlsplit(self.path or '')
+        query = urllib.parse.parse_qs(url.query, keep_blank_values=True)
+        if url.path.rstrip('/').endswith('/metrics') or 'metrics' in query:
+            coalescer = get_coalescer()
+            body = metrics.render(model_cache.stats(), coalescer.stats() if coalescer else None, admission).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path.rstrip('/').endswith('/shadow') or 'shadow' in query:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(dumps_bytes({**get_shadow_scorer().stats(), 'cache': challenger_cache.stats()}))
+            return
+        if url.path.rstrip('/').endswith('/drift') or 'drift' in query:
+            reports = {
+                model_hash: monitor.report()
+                for model_hash, monitor in _drift_monitors.items() if monitor is not None
+            }
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(dumps_bytes({'models': reports}))
+            return
+        
         self.send_response(200)
         self.send_header('Content-Type', 'application/json')
         self.end_headers()
-        self.wfile.write(json.dumps({
+        self.wfile.write(dumps_bytes({
             'status': 'ok',
-            'message': 'Python prediction service is running (optimized - no pandas)'
-        }).encode())
+            'message': 'Python prediction service is running (optimized - no pandas)',
+            'admission': admission.stats()
+        }))
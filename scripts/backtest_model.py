@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Historical backtest of a model against actual FOMC decisions.
+
+Replays dated feature snapshots through the model in one batched pass, lines
+each prediction up with the decision that followed (from
+public/fed_decision_rate_fomc_ym.json) and reports accuracy, calibration and
+confusion matrices overall and by period. Reports are cached per model hash,
+snapshot hash and options, so re-running or comparing models is cheap.
+
+Snapshots are .npz (arrays 'dates' and 'X') or JSON
+([{"Date": "YYYY-MM", <feature>: value, ...}, ...]).
+
+Feature columns can be backfilled point-in-time from the decision history
+with --fill FEATURE=SERIES (e.g. --fill Previous=FedDecisionRate): each
+snapshot gets the last value published strictly before its date.
+
+Usage:
+    python backtest_model.py model.pkl --snapshots snapshots.json --period decade
+    python backtest_model.py model.pkl --snapshots snapshots.json --fill FedFundsRate=FedDecisionRate
+    python backtest_model.py a.pkl b.pkl --snapshots snapshots.npz
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _lib.backtest import DEFAULT_DECISIONS_PATH, DecisionIndex, run_backtest
+from _lib.categorical import list_value, load_encoders
+from _lib.model_cache import content_hash
+from _lib.timeseries import TimeSeriesStore
+from predict_api import get_original_features
+
+
+def feature_value(column, value, encoders):
+    """Coerce one JSON feature value to float with the service's list and categorical rules"""
+    if isinstance(value, list):
+        return list_value(column, value)
+    if column in encoders:
+        return encoders[column].encode(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def load_snapshots(path, feature_columns, encoders):
+    """Return (dates, X, raw bytes) from an .npz or JSON snapshot file"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if path.endswith('.npz'):
+        with np.load(path, allow_pickle=False) as data:
+            return [str(d) for d in data['dates']], np.asarray(data['X'], dtype=np.float64), raw
+    records = json.loads(raw)
+    dates = [r['Date'] for r in records]
+    X = np.array([[feature_value(col, r.get(col, 0), encoders) for col in feature_columns] for r in records],
+                 dtype=np.float64)
+    return dates, X, raw
+
+
+def fill_from_history(X, dates, feature_columns, fills, store):
+    """Overwrite feature columns with as-of values (strictly before each snapshot date)"""
+    X = X.copy()
+    index = {name: i for i, name in enumerate(feature_columns)}
+    for feature, series in fills:
+        values = store.as_of_many(series, dates, strict=True)
+        column = X[:, index[feature]]
+        X[:, index[feature]] = np.where(np.isnan(values), column, values)
+    return X
+
+
+def parse_fills(specs, feature_columns, store):
+    fills = []
+    for spec in specs or []:
+        feature, _, series = spec.partition('=')
+        if feature not in feature_columns or series not in store.series:
+            raise SystemExit(f"Error: --fill {spec}: unknown feature or series "
+                             f"(series available: {', '.join(store.names())})")
+        fills.append((feature, series))
+    return fills
+
+
+def backtest_model(model_path, snapshots_path, decisions, decisions_hash, args, store=None):
+    with open(model_path, 'rb') as f:
+        payload = f.read()
+    model_hash = content_hash(payload)
+    model = pickle.loads(payload)
+    feature_columns = get_original_features()
+    n_features = getattr(model, 'n_features_in_', len(feature_columns))
+    if n_features != len(feature_columns):
+        raise SystemExit(f"Error: {model_path} expects {n_features} features, "
+                         f"the service provides {len(feature_columns)}")
+    dates, X, raw = load_snapshots(snapshots_path, feature_columns, load_encoders(model, model_path))
+    fills = parse_fills(args.fill, feature_columns, store) if store is not None else []
+    if fills:
+        X = fill_from_history(X, dates, feature_columns, fills, store)
+
+    options = f"{args.period}-{'after' if args.strictly_after else 'at'}-{decisions_hash[:12]}"
+    if fills:
+        options += '-' + content_hash(json.dumps(fills).encode())[:8]
+    cache_path = os.path.join(args.cache_dir, f"{model_hash[:16]}-{content_hash(raw)[:16]}-{options}.json")
+    if not args.no_cache and os.path.exists(cache_path):
+        with open(cache_path, 'r') as f:
+            report = json.load(f)
+        report['model_path'] = model_path
+        report['cached'] = True
+        return report
+
+    start = time.perf_counter()
+    report = run_backtest(model, dates, X, decisions, args.period, args.strictly_after)
+    report['model_path'] = model_path
+    report['model_sha256'] = model_hash
+    report['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    if not args.no_cache:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(report, f)
+    report['cached'] = False
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest models against historical FOMC decisions")
+    parser.add_argument('model_paths', nargs='+', help="One or more .pkl models")
+    parser.add_argument('--snapshots', required=True, help="Dated feature snapshots (.npz or JSON)")
+    parser.add_argument('--decisions', default=DEFAULT_DECISIONS_PATH, help="FOMC decision history JSON")
+    parser.add_argument('--period', choices=('year', 'decade', 'all'), default='year')
+    parser.add_argument('--strictly-after', action='store_true',
+                        help="Match the first decision after the snapshot month instead of at or after it")
+    parser.add_argument('--fill', action='append', metavar='FEATURE=SERIES',
+                        help="Backfill a feature point-in-time from a decision-history series (repeatable)")
+    parser.add_argument('--cache-dir', default='.backtest_cache', help="Where reports and series caches live")
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--output', help="Write the reports as JSON")
+    args = parser.parse_args()
+
+    decisions = DecisionIndex.load(args.decisions)
+    for month, meetings in decisions.collapsed.items():
+        print(f"Warning: {meetings} decisions in {month}; backtesting against the month's net change",
+              file=sys.stderr)
+    with open(args.decisions, 'rb') as f:
+        decisions_hash = content_hash(f.read())
+    store = None
+    if args.fill:
+        # Decisions become visible at the end of their month so no snapshot sees its own outcome
+        os.makedirs(args.cache_dir, exist_ok=True)
+        store = TimeSeriesStore.from_json_cached(
+            args.decisions, os.path.join(args.cache_dir, f"series-{decisions_hash[:12]}.npz"), period_end=True)
+    reports = [backtest_model(path, args.snapshots, decisions, decisions_hash, args, store)
+               for path in args.model_paths]
+    for report in reports:
+        overall = report['overall']
+        print(f"{report['model_path']}: accuracy {overall['accuracy']}, brier {overall['brier_score']}, "
+              f"ECE {overall['expected_calibration_error']} on {report['matched']} snapshots"
+              f"{' (cached)' if report['cached'] else ''}", file=sys.stderr)
+
+    output = json.dumps(reports if len(reports) > 1 else reports[0], indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
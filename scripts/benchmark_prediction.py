@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the prediction hot path.
+
+Builds synthetic forests (create_test_model.py style) at several sizes and
+feature counts and times each stage separately:
+
+    features   get_original_features + prepare_input_data
+    load       pickle.load of the model file
+    predict    make_prediction on a prepared row
+    handler_cold  full handler.do_POST against a local model_path, model
+                  cache cleared first so the model is read and unpickled
+    handler_warm  the same request served from the warm model cache
+    manual     python predict_manual.py (process start included)
+    api        python predict_api.py (process start included)
+
+Results are written as JSON. With --compare, each case is checked against a
+previous results file and the run fails when a median regresses by more
+than --threshold.
+
+Usage:
+    python benchmark_prediction.py --output bench.json
+    python benchmark_prediction.py --output new.json --compare bench.json --threshold 0.1
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from email.message import Message
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+
+from create_test_model import generate_synthetic_data
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+RUN_PREDICTION_PATH = os.path.join(ROOT_DIR, 'api', 'run-prediction.py')
+
+# (n_estimators, max_depth) per forest size
+FOREST_SIZES = {
+    'small': (50, 6),
+    'medium': (200, 10),
+    'large': (500, None),
+}
+FEATURE_COUNTS = [20, 63, 200]
+
+
+def load_run_prediction():
+    """Import api/run-prediction.py (its name is not a valid module name)"""
+    spec = importlib.util.spec_from_file_location('run_prediction', RUN_PREDICTION_PATH)
+    module = importlib.util.module_from_spec(spec)
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()  # swallow the import-time version banner
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.stdout = stdout
+    return module
+
+
+def timed(fn, repeats, warmup=1):
+    """Run fn repeatedly and summarize wall-clock timings in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+    return {
+        'repeats': repeats,
+        'min_ms': float(samples.min()),
+        'median_ms': float(np.median(samples)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'mean_ms': float(samples.mean()),
+    }
+
+
+def build_model(n_features, n_estimators, max_depth, path):
+    """Fit a synthetic 3-class forest and pickle it to path"""
+    X, y = generate_synthetic_data(n_samples=1000, n_features=n_features, n_classes=3)
+    # String labels like the production cut/hold/hike model
+    y = np.array(['-0.25%', '+0.00%', '+0.25%'])[y]
+    model = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=42)
+    model.fit(X, y)
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+    return model, X
+
+
+def make_handler(module, body):
+    """Create a handler instance wired to in-memory request/response streams"""
+
+    class BenchHandler(module.handler):
+        def log_message(self, format, *args):
+            pass
+
+    request = BenchHandler.__new__(BenchHandler)
+    request.rfile = io.BytesIO(body)
+    request.wfile = io.BytesIO()
+    request.headers = Message()
+    request.headers['Content-Length'] = str(len(body))
+    request.headers['Content-Type'] = 'application/json'
+    request.request_version = 'HTTP/1.1'
+    request.requestline = 'POST /api/run-prediction HTTP/1.1'
+    request.command = 'POST'
+    request.path = '/api/run-prediction'
+    request.client_address = ('127.0.0.1', 0)
+    request.close_connection = True
+    return request
+
+
+def run_handler(module, body, cold=False):
+    if cold:
+        module.model_cache.clear()
+    request = make_handler(module, body)
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()  # the handler prints progress lines
+    try:
+        request.do_POST()
+    finally:
+        sys.stdout = stdout
+    response = request.wfile.getvalue()
+    if b' 200 ' not in response.split(b'\r\n', 1)[0]:
+        raise RuntimeError(f"handler failed: {response[-300:]!r}")
+
+
+def run_script(args):
+    completed = subprocess.run([sys.executable] + args, capture_output=True, cwd=SCRIPTS_DIR)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{args[0]} failed: {completed.stdout[-300:]!r} {completed.stderr[-300:]!r}")
+
+
+def benchmark_case(module, size, n_features, repeats, script_repeats, workdir, stages):
+    """Time every requested stage for one (forest size, feature count) case"""
+    n_estimators, max_depth = FOREST_SIZES[size]
+    model_path = os.path.join(workdir, f"model_{size}_{n_features}.pkl")
+    model, X = build_model(n_features, n_estimators, max_depth, model_path)
+
+    # The service always feeds the fixed FOMC column list; other widths use generic names
+    production_columns = n_features == len(module.get_original_features())
+    if production_columns:
+        columns = module.get_original_features()
+    else:
+        columns = [f"feature_{i}" for i in range(n_features)]
+    features = {col: float(v) for col, v in zip(columns, X[0])}
+
+    case = {
+        'size': size,
+        'n_features': n_features,
+        'n_estimators': n_estimators,
+        'max_depth': max_depth,
+        'model_bytes': os.path.getsize(model_path),
+        'stages': {},
+    }
+    stages_out = case['stages']
+
+    if 'features' in stages:
+        if production_columns:
+            stages_out['features'] = timed(
+                lambda: module.prepare_input_data(features, module.get_original_features()), repeats)
+        else:
+            stages_out['features'] = timed(lambda: module.prepare_input_data(features, columns), repeats)
+
+    if 'load' in stages:
+        def load():
+            with open(model_path, 'rb') as f:
+                pickle.load(f)
+        stages_out['load'] = timed(load, repeats)
+
+    if 'predict' in stages:
+        input_array = module.prepare_input_data(features, columns)
+        stages_out['predict'] = timed(lambda: module.make_prediction(model, input_array), repeats)
+
+    # The end-to-end paths only accept the 63 production columns
+    if not production_columns:
+        return case
+
+    body = json.dumps({'model_path': model_path, 'features': features}).encode()
+    if 'handler_cold' in stages:
+        stages_out['handler_cold'] = timed(lambda: run_handler(module, body, cold=True), repeats)
+    if 'handler_warm' in stages:
+        stages_out['handler_warm'] = timed(lambda: run_handler(module, body), repeats)
+
+    if 'manual' in stages:
+        features_path = os.path.join(workdir, 'features.json')
+        with open(features_path, 'w') as f:
+            json.dump(features, f)
+        stages_out['manual'] = timed(
+            lambda: run_script(['predict_manual.py', model_path, features_path]), script_repeats, warmup=0)
+
+    if 'api' in stages:
+        stages_out['api'] = timed(
+            lambda: run_script(['predict_api.py', model_path, json.dumps(features)]), script_repeats, warmup=0)
+
+    return case
+
+
+def case_key(case):
+    return f"{case['size']}/{case['n_features']}"
+
+
+def compare(current, baseline, threshold):
+    """
+    Compare median timings per case and stage.
+
+    Returns:
+        (rows, regressions) where each row is a dict describing one stage
+    """
+    baseline_cases = {case_key(c): c for c in baseline.get('cases', [])}
+    rows, regressions = [], []
+    for case in current['cases']:
+        previous = baseline_cases.get(case_key(case))
+        if not previous:
+            continue
+        for stage, stats in case['stages'].items():
+            before = previous['stages'].get(stage)
+            if not before:
+                continue
+            ratio = stats['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+            row = {
+                'case': case_key(case),
+                'stage': stage,
+                'baseline_ms': before['median_ms'],
+                'current_ms': stats['median_ms'],
+                'change': ratio - 1.0,
+            }
+            rows.append(row)
+            if ratio - 1.0 > threshold:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the prediction hot path")
+    parser.add_argument('--output', default='bench_results.json', help="Where to write results JSON")
+    parser.add_argument('--compare', help="Previous results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Allowed relative slowdown of a median before failing")
+    parser.add_argument('--sizes', default=','.join(FOREST_SIZES), help="Comma-separated forest sizes")
+    parser.add_argument('--features', default=','.join(str(n) for n in FEATURE_COUNTS),
+                        help="Comma-separated feature counts")
+    parser.add_argument('--stages', default='features,load,predict,handler_cold,handler_warm,manual,api',
+                        help="Comma-separated stages to run ('handler' runs both handler stages)")
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--script-repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    module = load_run_prediction()
+    stages = set(args.stages.split(','))
+    if 'handler' in stages:
+        stages |= {'handler_cold', 'handler_warm'}
+    results = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+        },
+        'cases': [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes.split(','):
+            for n_features in (int(n) for n in args.features.split(',')):
+                case = benchmark_case(module, size, n_features, args.repeats,
+                                      args.script_repeats, workdir, stages)
+                results['cases'].append(case)
+                summary = ', '.join(f"{stage} {stats['median_ms']:.2f}ms"
+                                    for stage, stats in case['stages'].items())
+                print(f"{case_key(case)}: {summary}", file=sys.stderr)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.threshold)
+        for row in rows:
+            marker = 'REGRESSION' if row in regressions else ''
+            print(f"{row['case']:<14} {row['stage']:<9} {row['baseline_ms']:>10.3f}ms -> "
+                  f"{row['current_ms']:>10.3f}ms ({row['change']:+.1%}) {marker}")
+        if regressions:
+            print(f"❌ {len(regressions)} stage(s) slower than {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ No regressions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,19 +11,24 @@ from sklearn.datasets import make_classification
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
 
+def generate_synthetic_data(n_samples=1000, n_features=10, n_classes=2, random_state=42):
+    """Generate a synthetic classification dataset."""
+    n_informative = max(n_classes, int(n_features * 0.8))
+    return make_classification(
+        n_samples=n_samples,
+        n_features=n_features,
+        n_informative=n_informative,
+        n_redundant=n_features - n_informative,
+        n_classes=n_classes,
+        random_state=random_state
+    )
+
 def create_test_model():
     """Create a simple test model for demonstration."""
     
     # Generate synthetic data
     print("Generating synthetic data...")
-    X, y = make_classification(
-        n_samples=1000,
-        n_features=10,
-        n_informative=8,
-        n_redundant=2,
-        n_classes=2,
-        random_state=42
-    )
+    X, y = generate_synthetic_data()
     
     # Split the data
     X_train, X_test, y_train, y_test = train_test_split(
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Parallel text feature extraction for a corpus of FOMC statements and minutes.
+
+Streams documents from a directory (*.txt, *.md, *.html, recursively) or a
+JSONL file ({"id": ..., "date": ..., "text": ...} per line). HTML pages are
+reduced to their visible text before extraction. Chunks of
+documents are fanned out to a process pool with a bounded number of chunks in
+flight. The feature rows are appended to the output directory as columnar
+.npz segments, so memory stays bounded however large the corpus is.
+
+Documents are identified by the sha256 of their text. Hashes already present
+in the output directory are skipped, so re-running after adding documents only
+processes the new ones.
+
+Usage:
+    python extract_corpus_features.py statements/ --output corpus_features
+    python extract_corpus_features.py minutes.jsonl --output corpus_features --workers 8
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+from html.parser import HTMLParser
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _lib.text_features import TEXT_FEATURE_COLUMNS, extract_text_features
+
+DOCUMENT_EXTENSIONS = ('.txt', '.md', '.html', '.htm')
+HTML_EXTENSIONS = ('.html', '.htm')
+_DATE_IN_NAME = re.compile(r'(\d{4})-?(\d{2})(?:-?(\d{2}))?')
+
+
+def date_from_name(name):
+    """Best-effort YYYY-MM[-DD] from a file name such as monetary20230201a.htm"""
+    match = _DATE_IN_NAME.search(os.path.basename(name))
+    if not match:
+        return ''
+    year, month, day = match.groups()
+    return f"{year}-{month}" + (f"-{day}" if day else '')
+
+
+class _HTMLText(HTMLParser):
+    """Collects the visible text of an HTML page (script/style content dropped)"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        elif tag in ('p', 'br', 'div', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(markup):
+    """Strip tags and attributes and unescape entities, so features see only the statement text"""
+    parser = _HTMLText()
+    parser.feed(markup)
+    parser.close()
+    return ''.join(parser.parts)
+
+
+def iter_documents(source):
+    """Yield (doc_id, date, text) without holding the corpus in memory"""
+    if os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, '**', '*'), recursive=True)):
+            if os.path.isfile(path) and path.lower().endswith(DOCUMENT_EXTENSIONS):
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+                if path.lower().endswith(HTML_EXTENSIONS):
+                    text = html_to_text(text)
+                yield os.path.relpath(path, source), date_from_name(path), text
+        return
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            doc_id = str(record.get('id', line_number))
+            yield doc_id, str(record.get('date') or record.get('Date') or ''), record.get('text', '')
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def existing_hashes(output_dir):
+    """Content hashes of every document already written to output_dir"""
+    hashes = set()
+    for path in glob.glob(os.path.join(output_dir, 'part-*.npz')):
+        with np.load(path, allow_pickle=False) as data:
+            hashes.update(h.decode() for h in data['content_hash'])
+    return hashes
+
+
+def extract_chunk(documents):
+    """Worker: features for a list of (doc_id, date, sha256, text); returns column arrays"""
+    features = np.empty((len(documents), len(TEXT_FEATURE_COLUMNS)), dtype=np.float32)
+    for row, (_, _, _, text) in enumerate(documents):
+        extracted = extract_text_features(text)
+        features[row] = [extracted[col] for col in TEXT_FEATURE_COLUMNS]
+    return {
+        'id': np.array([d[0] for d in documents], dtype=str),
+        'date': np.array([d[1] for d in documents], dtype=str),
+        'content_hash': np.array([d[2] for d in documents], dtype='S64'),
+        'features': features,
+    }
+
+
+class SegmentWriter:
+    """Buffers result chunks and appends them to output_dir as columnar .npz parts"""
+
+    def __init__(self, output_dir, segment_rows):
+        self.output_dir = output_dir
+        self.segment_rows = segment_rows
+        self.pending = []
+        self.pending_rows = 0
+        self.written = 0
+        os.makedirs(output_dir, exist_ok=True)
+        self.sequence = len(glob.glob(os.path.join(output_dir, 'part-*.npz')))
+
+    def add(self, chunk):
+        self.pending.append(chunk)
+        self.pending_rows += len(chunk['features'])
+        if self.pending_rows >= self.segment_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        columns = {key: np.concatenate([c[key] for c in self.pending]) for key in self.pending[0]}
+        path = os.path.join(self.output_dir, f"part-{self.sequence:06d}-{os.getpid()}.npz")
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, columns=np.asarray(json.dumps(list(TEXT_FEATURE_COLUMNS))), **columns)
+        os.replace(tmp_path, path)
+        self.sequence += 1
+        self.written += self.pending_rows
+        self.pending = []
+        self.pending_rows = 0
+
+
+def load_corpus_features(output_dir):
+    """Concatenate all parts into {'id', 'date', 'content_hash', 'features', 'columns'}"""
+    parts = {}
+    columns = list(TEXT_FEATURE_COLUMNS)
+    for path in sorted(glob.glob(os.path.join(output_dir, 'part-*.npz'))):
+        with np.load(path, allow_pickle=False) as data:
+            columns = json.loads(str(data['columns']))
+            for key in ('id', 'date', 'content_hash', 'features'):
+                parts.setdefault(key, []).append(data[key])
+    result = {key: np.concatenate(values) for key, values in parts.items()}
+    result['columns'] = columns
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract text features from a statement corpus in parallel")
+    parser.add_argument('source', help="Directory of documents or a JSONL file")
+    parser.add_argument('--output', default='corpus_features', help="Output directory for columnar parts")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Documents per work unit")
+    parser.add_argument('--segment-rows', type=int, default=4096, help="Rows per output part")
+    args = parser.parse_args()
+
+    seen = existing_hashes(args.output) if os.path.isdir(args.output) else set()
+    writer = SegmentWriter(args.output, args.segment_rows)
+    workers = args.workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    start = time.perf_counter()
+    skipped = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        chunk = []
+
+        def submit(documents):
+            # Bound memory: wait for a slot before queuing another chunk
+            while len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    writer.add(future.result())
+            in_flight.add(pool.submit(extract_chunk, documents))
+
+        for doc_id, date, text in iter_documents(args.source):
+            digest = content_hash(text)
+            if digest in seen:
+                skipped += 1
+                continue
+            seen.add(digest)  # also drops duplicates within this run
+            chunk.append((doc_id, date, digest, text))
+            if len(chunk) >= args.chunk_size:
+                submit(chunk)
+                chunk = []
+        if chunk:
+            submit(chunk)
+        for future in in_flight:
+            writer.add(future.result())
+    writer.flush()
+
+    print(json.dumps({
+        'processed': writer.written,
+        'skipped': skipped,
+        'output': args.output,
+        'elapsed_seconds': round(time.perf_counter() - start, 3),
+    }))
+
+
+if __name__ == "__main__":
+    main()
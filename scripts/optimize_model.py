@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Model optimization tool for uploaded forest models.
+
+Prunes trees by depth or node count, drops low-contribution estimators and
+writes a compact artifact: a pruned scikit-learn .pkl that the prediction
+service loads as before, and optionally a compiled .npz with quantized
+thresholds and leaf values. The .npz is for offline use only (benchmarks,
+batch scoring via CompiledForest.load); the service never loads it and
+compiles its own reduced-precision copy from the .pkl on request.
+
+Trees are ranked on a selection slice of the held-out rows (--selection-fraction)
+and the report, including the accuracy guardrail, is computed on the remaining
+rows only, so the pruned model is never scored on the rows that picked it.
+Reports size, load time, latency and the accuracy delta, and refuses to write
+when accuracy drops more than the allowed amount.
+
+Usage:
+    python optimize_model.py model.pkl --max-depth 8 --keep-estimators 0.5 \
+        --holdout holdout.npz --output model_compact.pkl --compiled model_compact.npz
+"""
+
+import argparse
+import copy
+import heapq
+import json
+import os
+import pickle
+import sys
+import time
+import numpy as np
+
+# Compiled forest helpers live next to the Vercel function in api/_lib
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _lib.compiled_forest import CompiledForest, reference_rows
+
+TREE_LEAF = -1
+TREE_UNDEFINED = -2
+
+
+def load_model(model_path):
+    """Load a pickled model and time a warm unpickling (sklearn imports excluded)"""
+    with open(model_path, 'rb') as f:
+        payload = f.read()
+    pickle.loads(payload)
+    start = time.perf_counter()
+    model = pickle.loads(payload)
+    return model, time.perf_counter() - start
+
+
+def load_holdout(holdout_path):
+    """
+    Load held-out rows from .npz (arrays X and optional y) or
+    JSON ({"X": [[...]], "y": [...]}).
+    """
+    if holdout_path.endswith('.npz'):
+        with np.load(holdout_path, allow_pickle=False) as data:
+            return data['X'], (data['y'] if 'y' in data else None)
+    with open(holdout_path, 'r') as f:
+        data = json.load(f)
+    y = data.get('y')
+    return np.asarray(data['X'], dtype=np.float64), (np.asarray(y) if y is not None else None)
+
+
+def split_holdout(X, y, selection_fraction, seed=0):
+    """
+    Split held-out rows into a selection part (ranks trees) and an evaluation
+    part (scores the result). Returns (X_select, y_select, X_eval, y_eval).
+    """
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_select = int(round(len(X) * selection_fraction))
+    n_select = min(max(n_select, 1), len(X) - 1)
+    select, held = order[:n_select], order[n_select:]
+    return (X[select], None if y is None else y[select],
+            X[held], None if y is None else y[held])
+
+
+def prune_tree(estimator, max_depth=None, max_nodes=None):
+    """
+    Prune a fitted decision tree in place.
+
+    Internal nodes deeper than max_depth become leaves. With max_nodes, nodes
+    are expanded from the root in order of weighted sample count until the
+    budget is spent, so the most populated paths survive. Collapsed nodes keep
+    their own class distribution, which sklearn stores for every node.
+    """
+    tree = estimator.tree_
+    state = tree.__getstate__()
+    nodes = state['nodes']
+    values = state['values']
+
+    kept = {0: 0}  # node id -> depth
+    frontier = []
+    budget = max_nodes if max_nodes else np.inf
+
+    def push(node_id, depth):
+        is_internal = nodes['left_child'][node_id] != TREE_LEAF
+        if is_internal and (max_depth is None or depth < max_depth):
+            heapq.heappush(frontier, (-nodes['weighted_n_node_samples'][node_id], node_id, depth))
+
+    push(0, 0)
+    while frontier and len(kept) + 2 <= budget:
+        _, node_id, depth = heapq.heappop(frontier)
+        for child in (nodes['left_child'][node_id], nodes['right_child'][node_id]):
+            kept[child] = depth + 1
+            push(child, depth + 1)
+
+    # Renumber surviving nodes depth-first so children follow their parents
+    order = []
+    stack = [0]
+    while stack:
+        node_id = stack.pop()
+        order.append(node_id)
+        left, right = nodes['left_child'][node_id], nodes['right_child'][node_id]
+        if left in kept:
+            stack.extend((right, left))
+    new_id = {old: new for new, old in enumerate(order)}
+
+    new_nodes = nodes[order].copy()
+    for i, old in enumerate(order):
+        left, right = nodes['left_child'][old], nodes['right_child'][old]
+        if left in kept:
+            new_nodes['left_child'][i] = new_id[left]
+            new_nodes['right_child'][i] = new_id[right]
+        else:
+            new_nodes['left_child'][i] = TREE_LEAF
+            new_nodes['right_child'][i] = TREE_LEAF
+            new_nodes['feature'][i] = TREE_UNDEFINED
+            new_nodes['threshold'][i] = TREE_UNDEFINED
+
+    state = dict(state)
+    state['nodes'] = new_nodes
+    state['values'] = np.ascontiguousarray(values[order])
+    state['node_count'] = len(order)
+    state['max_depth'] = max(kept[node_id] for node_id in order)
+    tree.__setstate__(state)
+    return estimator
+
+
+def estimator_contributions(model, X, y=None):
+    """
+    Score each tree by how often its vote matches the target.
+    The target is y when given, otherwise the full forest's own prediction.
+    """
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    if y is None:
+        target = np.argmax(model.predict_proba(X), axis=1)
+    else:
+        target = np.searchsorted(model.classes_, y)
+    return np.array([
+        np.mean(np.argmax(e.predict_proba(X32, check_input=False), axis=1) == target)
+        for e in model.estimators_
+    ])
+
+
+def select_estimators(model, X, y=None, keep=1.0):
+    """Keep the highest-contributing trees (keep is a fraction or a count)"""
+    n_trees = len(model.estimators_)
+    n_keep = int(round(keep * n_trees)) if keep <= 1 else int(keep)
+    n_keep = max(1, min(n_keep, n_trees))
+    if n_keep == n_trees:
+        return model
+    scores = estimator_contributions(model, X, y)
+    best = sorted(np.argsort(-scores, kind='stable')[:n_keep])
+    model.estimators_ = [model.estimators_[i] for i in best]
+    model.n_estimators = n_keep
+    return model
+
+
+def evaluate(model, X, y=None, reference=None, repeats=20):
+    """Measure single-row/batch latency and accuracy (or agreement with reference)"""
+    single = X[:1]
+    model.predict_proba(single)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(single)
+    single_ms = (time.perf_counter() - start) / repeats * 1000
+
+    start = time.perf_counter()
+    probabilities = model.predict_proba(X)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    labels = model.classes_.take(np.argmax(probabilities, axis=1))
+    report = {
+        'latency_single_ms': round(single_ms, 3),
+        'latency_batch_ms': round(batch_ms, 3),
+        'batch_rows': int(len(X)),
+    }
+    if y is not None:
+        report['accuracy'] = float(np.mean(labels == y))
+    if reference is not None:
+        report['agreement'] = float(np.mean(labels == reference))
+    return report, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune, quantize and re-serialize a forest model")
+    parser.add_argument('model_path', help="Path to the uploaded .pkl model")
+    parser.add_argument('--output', help="Where to write the pruned .pkl")
+    parser.add_argument('--compiled', help="Where to write the compiled .npz artifact")
+    parser.add_argument('--holdout', help="Held-out set (.npz with X/y or JSON {X, y})")
+    parser.add_argument('--max-depth', type=int, help="Collapse nodes below this depth")
+    parser.add_argument('--max-nodes', type=int, help="Node budget per tree")
+    parser.add_argument('--keep-estimators', type=float, default=1.0,
+                        help="Fraction (<=1) or count (>1) of trees to keep")
+    parser.add_argument('--quantize-thresholds', action='store_true',
+                        help="Store compiled thresholds as per-feature integer bins")
+    parser.add_argument('--quantize-values', action='store_true',
+                        help="Store compiled leaf probabilities as uint8")
+    parser.add_argument('--selection-fraction', type=float, default=0.3,
+                        help="Share of held-out rows used to rank trees; the rest are used for evaluation")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help="Refuse to write when accuracy (or agreement) drops more than this")
+    args = parser.parse_args()
+
+    model, load_seconds = load_model(args.model_path)
+    if not isinstance(getattr(model, 'estimators_', None), list):
+        print(f"Error: {type(model).__name__} is not a forest model")
+        sys.exit(1)
+
+    if args.holdout:
+        X, y = load_holdout(args.holdout)
+    else:
+        print("No held-out set given; measuring agreement on boundary reference rows")
+        X, y = reference_rows(CompiledForest.from_sklearn(model), n_rows=2000).astype(np.float64), None
+    if len(X) < 2:
+        print("Error: the held-out set needs at least two rows (selection and evaluation)")
+        sys.exit(1)
+    X_select, y_select, X, y = split_holdout(X, y, args.selection_fraction)
+
+    original_report, original_labels = evaluate(model, X, y)
+    original_report.update({
+        'size_bytes': os.path.getsize(args.model_path),
+        'load_ms': round(load_seconds * 1000, 3),
+        'n_estimators': len(model.estimators_),
+        'total_nodes': int(sum(e.tree_.node_count for e in model.estimators_)),
+    })
+
+    optimized = copy.deepcopy(model)
+    optimized = select_estimators(optimized, X_select, y_select, args.keep_estimators)
+    if args.max_depth is not None or args.max_nodes is not None:
+        for estimator in optimized.estimators_:
+            prune_tree(estimator, args.max_depth, args.max_nodes)
+
+    optimized_report, _ = evaluate(optimized, X, y, reference=original_labels)
+    payload = pickle.dumps(optimized, protocol=pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    pickle.loads(payload)
+    optimized_report.update({
+        'size_bytes': len(payload),
+        'load_ms': round((time.perf_counter() - start) * 1000, 3),
+        'n_estimators': len(optimized.estimators_),
+        'total_nodes': int(sum(e.tree_.node_count for e in optimized.estimators_)),
+    })
+
+    report = {'original': original_report, 'optimized': optimized_report,
+              'selection_rows': int(len(X_select)), 'evaluation_rows': int(len(X))}
+
+    compiled = CompiledForest.from_sklearn(optimized, quantize=args.quantize_thresholds)
+    if args.quantize_values:
+        compiled = compiled.quantize_values()
+    compiled_report, _ = evaluate(compiled, X, y, reference=original_labels)
+    report['compiled'] = compiled_report
+
+    metric = 'accuracy' if y is not None else 'agreement'
+    baseline = original_report.get('accuracy', 1.0)
+    worst = min(optimized_report[metric], compiled_report[metric])
+    report['accuracy_delta'] = round(worst - baseline, 6)
+    passed = baseline - worst <= args.max_accuracy_drop
+    report['passed'] = passed
+
+    if passed and args.output:
+        with open(args.output, 'wb') as f:
+            f.write(payload)
+        report['optimized']['path'] = args.output
+    if passed and args.compiled:
+        compiled.save(args.compiled)
+        start = time.perf_counter()
+        CompiledForest.load(args.compiled)
+        report['compiled'].update({
+            'path': args.compiled,
+            'size_bytes': os.path.getsize(args.compiled),
+            'load_ms': round((time.perf_counter() - start) * 1000, 3),
+        })
+
+    print(json.dumps(report, indent=2))
+    if not passed:
+        print(f"❌ {metric} dropped by {baseline - worst:.4f} (allowed {args.max_accuracy_drop}); nothing written",
+              file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,19 @@ import pandas as pd
 import numpy as np
 import json
 import sys
+import os
 import warnings
 import requests
 from datetime import datetime, timedelta
 warnings.filterwarnings('ignore')
 
+# Shared inference helpers live next to the Vercel function in api/_lib
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _lib.inference import infer
+from _lib.profiling import maybe_profile
+from _lib.categorical import encode_frame, load_encoders
+from _lib.serialization import dumps
+
 def load_original_model(model_path):
     """Load the trained model from pickle file"""
     try:
@@ -147,7 +155,7 @@ def fetch_features_from_api():
         print(f"Error fetching features from API: {e}")
         return None
 
-def prepare_input_from_api(features, feature_columns):
+def prepare_input_from_api(features, feature_columns, encoders=None):
     """Prepare input data from API features"""
     try:
         # Create DataFrame with one row
@@ -168,6 +176,9 @@ def prepare_input_from_api(features, feature_columns):
             if df[col].dtype == object and df[col].isin([True, False]).all():
                 df[col] = df[col].astype(bool)
         
+        # Same categorical / list encoding as the prediction service
+        encode_frame(df, encoders)
+        
         # Fill any remaining NaNs
         df = df.fillna(0)
         
@@ -179,13 +190,14 @@ def prepare_input_from_api(features, feature_columns):
 def predict(model, input_df):
     """Make prediction using the model"""
     try:
-        prediction = model.predict(input_df)[0]
-        probabilities = model.predict_proba(input_df)[0]
+        # Single predict_proba pass; the label is its argmax
+        scored = infer(model, input_df)
+        probabilities = scored['probabilities'][0]
         
         return {
-            'prediction': prediction,
+            'prediction': scored['labels'][0],
             'probabilities': dict(zip(model.classes_, probabilities.tolist())),
-            'confidence': float(max(probabilities))
+            'confidence': float(scored['confidence'][0])
         }
     except Exception as e:
         print(f"Error making prediction: {e}")
@@ -216,7 +228,7 @@ def main():
         sys.exit(1)
     
     # Prepare input data
-    input_df = prepare_input_from_api(features, feature_columns)
+    input_df = prepare_input_from_api(features, feature_columns, load_encoders(model, model_path))
     if input_df is None:
         sys.exit(1)
     
@@ -226,7 +238,9 @@ def main():
         sys.exit(1)
     
     # Output result as JSON
-    print(json.dumps(result, indent=2))
+    print(dumps(result, pretty=True))
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    # Profiled when PREDICTION_PROFILE=1 selects this run
+    with maybe_profile('predict_api'):
+        main() 
\ No newline at end of file
@@ -18,6 +18,11 @@ from typing import Dict, Any, Optional
 
 # Add the scripts directory to the path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Shared inference helpers live next to the Vercel function in api/_lib
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'api'))
+from _lib.inference import infer
+from _lib.categorical import encode_frame, load_encoders
+from _lib.serialization import dumps
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +40,7 @@ class ManualFeaturesPredictor:
         self.model_path = model_path
         self.features_path = features_path
         self.model = None
+        self.encoders = None
         self.feature_names = None
         
     def load_model(self) -> bool:
@@ -47,6 +53,7 @@ class ManualFeaturesPredictor:
         try:
             with open(self.model_path, 'rb') as f:
                 self.model = pickle.load(f)
+            self.encoders = load_encoders(self.model, self.model_path)
             
             # Try to get feature names from the model
             if hasattr(self.model, 'feature_names_in_'):
@@ -115,6 +122,9 @@ class ManualFeaturesPredictor:
         # Convert to DataFrame for easier manipulation
         df = pd.DataFrame([features])
         
+        # Categorical columns use the model's vocabulary, as in the prediction service
+        encode_frame(df, self.encoders)
+        
         # Handle categorical variables (convert to numeric if needed)
         for col in df.columns:
             if df[col].dtype == 'object':
@@ -161,13 +171,14 @@ class ManualFeaturesPredictor:
             # Preprocess features
             X = self.preprocess_features(features)
             
-            # Make prediction
-            prediction = self.model.predict(X)
+            # Make prediction (single predict_proba pass when available)
+            scored = infer(self.model, X)
+            prediction = scored['labels']
             prediction_proba = None
             
             # Get prediction probabilities if available
-            if hasattr(self.model, 'predict_proba'):
-                prediction_proba = self.model.predict_proba(X).tolist()
+            if scored['probabilities'] is not None:
+                prediction_proba = scored['probabilities'].tolist()
             
             # Format prediction based on model type
             if hasattr(self.model, 'classes_'):
@@ -241,7 +252,7 @@ def main():
     result = predictor.predict(features)
     
     # Output result
-    print(json.dumps(result, indent=2))
+    print(dumps(result, pretty=True))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
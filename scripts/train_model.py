@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Training pipeline with parallel cross-validated hyperparameter search.
+
+Every (candidate, fold) pair is fitted in a process pool. Fold splits and
+fitted fold estimators are memoized on disk, keyed by a hash of the data,
+the split settings and the candidate parameters, so a rerun only fits what
+is missing. Each candidate gets an accuracy report and a latency report,
+and the best candidate is refit on all rows and saved as a .pkl.
+
+Training data is either an encoded matrix (.npz or JSON with X/y) or JSON
+rows with raw feature values ({"rows": [{feature: value}, ...], "y": [...]}).
+For rows, a vocabulary is built for each categorical column (Topic). It is
+stored on the model and next to it as <model>.categories.json, so the service
+encodes categories exactly as training did.
+
+Usage:
+    python train_model.py --data train.npz --grid grid.json --output model.pkl
+    python train_model.py --data rows.json --output model.pkl
+    python train_model.py --synthetic --workers 8
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from create_test_model import generate_synthetic_data
+from optimize_model import load_holdout
+
+# Drift reference profiles live next to the Vercel function in api/_lib
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+from _lib.drift import build_reference_profile, profile_path_for, save_profile
+from _lib.categorical import (CATEGORICAL_COLUMNS, build_vocabulary, categories_path_for,
+                              encoders_from_vocabularies, list_value, save_vocabularies)
+from predict_api import get_original_features
+
+# Training data shared with worker processes once, via the pool initializer
+_worker_data = {}
+
+DEFAULT_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [6, 10, None],
+    'min_samples_leaf': [1, 3],
+}
+
+
+def expand_grid(grid):
+    """Turn {param: [values]} into a list of parameter dicts"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def encode_rows(rows, feature_columns, encoders):
+    """Raw feature dicts -> float matrix, with the same rules as the service's prepare_input_data"""
+    X = np.zeros((len(rows), len(feature_columns)))
+    for r, row in enumerate(rows):
+        for c, column in enumerate(feature_columns):
+            value = row.get(column, 0)
+            if isinstance(value, (list, tuple)):
+                value = list_value(column, value)
+            elif column in encoders:
+                value = encoders[column].encode(value)
+            elif value is None:
+                value = 0.0
+            try:
+                X[r, c] = float(value)
+            except (TypeError, ValueError):
+                X[r, c] = 0.0
+    return X
+
+
+def is_row_data(path):
+    """True when a JSON training file holds raw feature rows rather than an X matrix"""
+    with open(path, 'r') as f:
+        return 'rows' in json.load(f)
+
+
+def load_training_rows(path, feature_columns):
+    """
+    Load {"rows": [...], "y": [...]} JSON with raw feature values.
+
+    Returns:
+        (X, y, vocabularies) where vocabularies maps each categorical column
+        that holds strings to its sorted distinct values
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    rows = data['rows']
+    vocabularies = {}
+    for column in CATEGORICAL_COLUMNS:
+        strings = [row[column] for row in rows if isinstance(row.get(column), str)]
+        if strings:
+            vocabularies[column] = build_vocabulary(strings)
+    X = encode_rows(rows, feature_columns, encoders_from_vocabularies(vocabularies))
+    return X, np.asarray(data['y']), vocabularies
+
+
+def dataset_key(X, y):
+    """Content hash identifying a training set"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X).tobytes())
+    digest.update(str(X.shape).encode())
+    digest.update(np.asarray(y).astype(str).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_folds(cache_dir, data_key, y, n_splits, seed):
+    """Return [(train_idx, test_idx), ...], reusing the cached split if present"""
+    path = os.path.join(cache_dir, f"folds_{data_key}_{n_splits}_{seed}.npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return [(data[f'train_{i}'], data[f'test_{i}']) for i in range(n_splits)]
+
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    folds = list(splitter.split(np.zeros(len(y)), y))
+    arrays = {}
+    for i, (train_idx, test_idx) in enumerate(folds):
+        arrays[f'train_{i}'] = train_idx
+        arrays[f'test_{i}'] = test_idx
+    np.savez(path, **arrays)
+    return folds
+
+
+def measure_latency(model, X, repeats=20):
+    """Median single-row latency and per-row batch latency, in milliseconds"""
+    single = X[:1]
+    model.predict_proba(single)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict_proba(single)
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict_proba(X)
+    batch = time.perf_counter() - start
+    return {
+        'single_row_ms': float(np.median(timings) * 1000),
+        'batch_per_row_ms': float(batch / len(X) * 1000),
+    }
+
+
+def _init_worker(X, y):
+    _worker_data['X'] = X
+    _worker_data['y'] = y
+
+
+def fit_fold(task):
+    """
+    Fit (or load) one candidate on one fold and score it.
+    Runs in a worker process; returns plain data only.
+    """
+    train_idx, test_idx, params, seed, cache_path = task
+    X, y = _worker_data['X'], _worker_data['y']
+    cached = os.path.exists(cache_path)
+    if cached:
+        with open(cache_path, 'rb') as f:
+            model = pickle.load(f)
+        fit_seconds = 0.0
+    else:
+        model = RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+        start = time.perf_counter()
+        model.fit(X[train_idx], y[train_idx])
+        fit_seconds = time.perf_counter() - start
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+
+    X_test = X[test_idx]
+    probabilities = model.predict_proba(X_test)
+    labels = model.classes_.take(np.argmax(probabilities, axis=1))
+    return {
+        'accuracy': float(np.mean(labels == y[test_idx])),
+        'fit_seconds': fit_seconds,
+        'cached': cached,
+        'latency': measure_latency(model, X_test),
+    }
+
+
+def summarize(params, fold_results):
+    """Aggregate fold results into one candidate report"""
+    accuracies = np.array([r['accuracy'] for r in fold_results])
+    single = np.array([r['latency']['single_row_ms'] for r in fold_results])
+    batch = np.array([r['latency']['batch_per_row_ms'] for r in fold_results])
+    return {
+        'params': params,
+        'accuracy': {
+            'mean': float(accuracies.mean()),
+            'std': float(accuracies.std()),
+            'folds': accuracies.tolist(),
+        },
+        'latency': {
+            'single_row_ms': float(np.median(single)),
+            'batch_per_row_ms': float(np.median(batch)),
+        },
+        'fit_seconds': float(sum(r['fit_seconds'] for r in fold_results)),
+        'folds_cached': int(sum(r['cached'] for r in fold_results)),
+    }
+
+
+def search(X, y, grid, n_splits=5, seed=42, workers=None, cache_dir='.train_cache'):
+    """
+    Cross-validate every candidate in grid across a process pool.
+
+    Returns:
+        List of candidate reports sorted by mean accuracy (best first)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_key = dataset_key(X, y)
+    folds = load_folds(cache_dir, data_key, y, n_splits, seed)
+    candidates = expand_grid(grid)
+
+    tasks = {}
+    for c, params in enumerate(candidates):
+        for f, (train_idx, test_idx) in enumerate(folds):
+            cache_path = os.path.join(
+                cache_dir, f"fit_{data_key}_{n_splits}_{seed}_{f}_{params_key(params)}.pkl")
+            tasks[(c, f)] = (train_idx, test_idx, params, seed, cache_path)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        futures = {pool.submit(fit_fold, task): key for key, task in tasks.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            print(f"[{done}/{len(futures)}] candidate {futures[future][0]} fold {futures[future][1]}",
+                  file=sys.stderr)
+
+    reports = [
+        summarize(params, [results[(c, f)] for f in range(n_splits)])
+        for c, params in enumerate(candidates)
+    ]
+    # Prefer accuracy, then the faster model among ties
+    reports.sort(key=lambda r: (-r['accuracy']['mean'], r['latency']['single_row_ms']))
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for forest models")
+    parser.add_argument('--data', help="Training set (.npz with X/y or JSON {X, y})")
+    parser.add_argument('--synthetic', action='store_true', help="Use a synthetic 63-feature, 3-class dataset")
+    parser.add_argument('--grid', help="JSON file with {param: [values]}")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--cache-dir', default='.train_cache', help="Where folds and fitted estimators are memoized")
+    parser.add_argument('--output', default='model.pkl', help="Where to save the refit best model")
+    parser.add_argument('--report', help="Write the full search report as JSON")
+    args = parser.parse_args()
+
+    vocabularies = {}
+    if args.data and args.data.endswith('.json') and is_row_data(args.data):
+        X, y, vocabularies = load_training_rows(args.data, get_original_features())
+    elif args.data:
+        X, y = load_holdout(args.data)
+        if y is None:
+            print("Error: training data needs labels (y)")
+            sys.exit(1)
+    elif args.synthetic:
+        X, y = generate_synthetic_data(n_samples=2000, n_features=63, n_classes=3)
+    else:
+        parser.error("pass --data or --synthetic")
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, 'r') as f:
+            grid = json.load(f)
+
+    start = time.perf_counter()
+    reports = search(X, y, grid, args.folds, args.seed, args.workers, args.cache_dir)
+    best = reports[0]
+    print(f"Search finished in {time.perf_counter() - start:.1f}s; best params: {best['params']} "
+          f"(accuracy {best['accuracy']['mean']:.4f} ± {best['accuracy']['std']:.4f})", file=sys.stderr)
+
+    model = RandomForestClassifier(random_state=args.seed, n_jobs=-1, **best['params'])
+    model.fit(X, y)
+    model.n_jobs = None
+    if vocabularies:
+        # Travels with the pickle (Supabase uploads) and as a sidecar for local paths
+        model.categorical_vocabularies_ = vocabularies
+        save_vocabularies(vocabularies, categories_path_for(args.output))
+    with open(args.output, 'wb') as f:
+        pickle.dump(model, f)
+    # Training distribution summary used by the service's drift monitor, with the
+    # service's column names so /drift reports name real features
+    feature_names = get_original_features()
+    if X.shape[1] != len(feature_names):
+        print(f"Warning: training data has {X.shape[1]} columns, the service expects {len(feature_names)}; "
+              f"drift profile uses generic names", file=sys.stderr)
+        feature_names = None
+    save_profile(build_reference_profile(X, feature_names), profile_path_for(args.output))
+
+    summary = {'best': best, 'candidates': reports, 'model_path': args.output}
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(summary, f, indent=2)
+    print(json.dumps(best, indent=2))
+
+
+if __name__ == "__main__":
+    main()